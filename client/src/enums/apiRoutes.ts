@@ -5,6 +5,7 @@ enum APIRoutes {
   UPDATE_TRANSACTION = '/transaction/',
   DELETE_TRANSACTION = '/transaction/',
   CREATE_GROUP = '/transaction/create-group',
+  LOOKUP_GROUP = '/transaction/group/lookup',
   UPDATE_GROUP = '/transaction/group/',
   DELETE_GROUP = '/transaction/group/',
   FETCH_USER_DATA = '/social_auth/user',
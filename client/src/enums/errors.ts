@@ -2,6 +2,8 @@ enum Errors {
   ZERO_AMOUNT = 'Amount cannot be zero',
   EMPTY_NAME = 'Name cannot be empty',
   NAME_ALREADY_EXISTS = 'Name already exists',
+  NAME_CHECK_FAILED = 'Could not check the name, please try again',
+  SAVE_FAILED = 'Could not save, please try again',
 }
 
 export default Errors;
@@ -21,6 +21,11 @@ export type TGroup = {
   created: string;
 };
 
+export type TGroupLookup = {
+  exists: boolean;
+  uuid: string | null;
+};
+
 export type TItem = {
   uuid: string;
   name: string;
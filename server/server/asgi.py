@@ -7,10 +7,46 @@ For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
 
+import asyncio
 import os
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server.settings')
+# Under ASGI each request runs its sync code on its own thread, and a persistent connection would be left open per thread;
+# close them per request and let a pooler (DB_POOLER=pgbouncer) keep server connections warm instead
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
-application = get_asgi_application()
+def cancel_on_disconnect(app):
+    # Django 4.2 keeps iterating a streaming response after the client leaves; stop it so event streams unsubscribe
+    async def wrapper(scope, receive, send):
+        if scope['type'] != 'http':
+            return await app(scope, receive, send)
+
+        response_started = asyncio.Event()
+
+        async def watched_send(message):
+            if message['type'] == 'http.response.start':
+                response_started.set()
+            await send(message)
+
+        async def wait_for_disconnect():
+            # The request body has been read by the time a response starts, so what's left is the disconnect
+            await response_started.wait()
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        app_task = asyncio.ensure_future(app(scope, receive, watched_send))
+        disconnect_task = asyncio.ensure_future(wait_for_disconnect())
+        try:
+            await asyncio.wait({app_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (app_task, disconnect_task):
+                task.cancel()
+            await asyncio.gather(app_task, disconnect_task, return_exceptions=True)
+        if not app_task.cancelled() and app_task.exception() is not None:
+            raise app_task.exception()
+
+    return wrapper
+
+application = cancel_on_disconnect(get_asgi_application())
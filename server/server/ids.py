@@ -0,0 +1,10 @@
+import os
+import time
+import uuid
+
+def uuid7() -> uuid.UUID:
+    # RFC 9562 layout: a leading millisecond timestamp makes new keys land on the right edge of B-tree indexes
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), 'big')
+    value = value & ~(0xF << 76) | 0x7 << 76
+    value = value & ~(0x3 << 62) | 0x2 << 62
+    return uuid.UUID(int=value)
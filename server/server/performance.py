@@ -0,0 +1,173 @@
+import logging
+import re
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from typing import Dict, List
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404
+
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+logger = logging.getLogger(__name__)
+
+DURATION_BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+QUERY_COUNT_BOUNDS = [0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144]
+
+class Histogram:
+    """Fixed-bucket histogram; quantiles are reported as the upper bound of the bucket they fall in."""
+
+    def __init__(self, bounds:List[float]):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value:float) -> None:
+        self.buckets[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q:float) -> float:
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(self.bounds[index], self.max) if index < len(self.bounds) else self.max
+        return 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 3) if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'max': round(self.max, 3),
+        }
+
+class ViewMetrics:
+    def __init__(self):
+        self.duration_ms = Histogram(DURATION_BOUNDS_MS)
+        self.db_ms = Histogram(DURATION_BOUNDS_MS)
+        self.queries = Histogram(QUERY_COUNT_BOUNDS)
+
+metrics = defaultdict(ViewMetrics)
+metrics_lock = threading.Lock()
+
+def record_metrics(view:str, duration_ms:float, db_ms:float, queries:int) -> None:
+    with metrics_lock:
+        view_metrics = metrics[view]
+        view_metrics.duration_ms.observe(duration_ms)
+        view_metrics.db_ms.observe(db_ms)
+        view_metrics.queries.observe(queries)
+
+def metrics_snapshot() -> Dict[str, Dict[str, Dict[str, float]]]:
+    with metrics_lock:
+        return {
+            view: {'duration_ms': m.duration_ms.snapshot(), 'db_ms': m.db_ms.snapshot(), 'queries': m.queries.snapshot()}
+            for view, m in sorted(metrics.items())
+        }
+
+def statement_shape(sql:str) -> str:
+    # IN lists and multi-row VALUES vary in length between calls made by the same line of code
+    return re.sub(r'%s(?:, %s)+', '%s', sql)
+
+def call_site() -> str:
+    # The innermost frame in project code, skipping this module and installed packages
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        if frame.filename.startswith(str(settings.BASE_DIR)) and frame.filename != __file__ and 'site-packages' not in frame.filename:
+            return f'{frame.filename}:{frame.lineno} in {frame.name}'
+    return 'unknown'
+
+class QueryRecorder:
+    """`execute_wrapper` that counts and times every query a request runs."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.repeated = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+
+            shape = statement_shape(sql)
+            self.shapes[shape] += 1
+            # The stack is only walked once a statement looks like a loop, not for every query
+            if self.shapes[shape] == settings.PERF_N_PLUS_ONE_THRESHOLD:
+                self.repeated[shape] = call_site()
+            if elapsed * 1000 >= settings.PERF_SLOW_QUERY_MS:
+                logger.warning('Slow query (%.1fms) at %s: %s', elapsed * 1000, call_site(), sql)
+
+class PerformanceMiddleware:
+    """Times each request and its queries, feeds the histograms, and adds a Server-Timing header."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with self.start_recording(recorder):
+            response = self.get_response(request)
+        return self.finish(request, response, recorder, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        # Connections are per thread, so the wrappers go on the thread that runs this request's sync code and ORM calls
+        recording = await sync_to_async(self.start_recording)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recording.close)()
+        return self.finish(request, response, recorder, time.perf_counter() - started)
+
+    def start_recording(self, recorder:QueryRecorder) -> ExitStack:
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        return stack
+
+    def finish(self, request, response, recorder:QueryRecorder, elapsed:float):
+        match = request.resolver_match
+        view = f'{request.method} {match.view_name if match else "unresolved"}'
+        duration_ms, db_ms = elapsed * 1000, recorder.duration * 1000
+
+        record_metrics(view, duration_ms, db_ms, recorder.count)
+        for shape, site in recorder.repeated.items():
+            logger.warning('Possible N+1 in %s: %d runs of the same query at %s: %s', view, recorder.shapes[shape], site, shape)
+        if settings.SERVER_TIMING_ENABLED:
+            response['Server-Timing'] = f'app;dur={duration_ms:.1f}, db;dur={db_ms:.1f};desc="{recorder.count} queries"'
+        return response
+
+class PerformanceMetrics(APIView):
+    def get(self, request):
+        if not settings.PERF_METRICS_ENABLED:
+            raise Http404
+        return Response(metrics_snapshot())
@@ -0,0 +1,31 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Only code that asks for it reads from a replica; everything else, and every write, stays on the primary
+replica_reads = ContextVar('replica_reads', default=False)
+
+@contextmanager
+def reading_from_replica():
+    token = replica_reads.set(True)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+class ReplicaRouter:
+    """Sends reads made inside `reading_from_replica()` to a random DB_REPLICAS alias."""
+
+    def db_for_read(self, model, **hints):
+        if replica_reads.get() and settings.DB_REPLICAS:
+            return random.choice(settings.DB_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
@@ -34,8 +34,6 @@ ALLOWED_HOSTS = ['127.0.0.1','greenwallet-api.onrender.com','api.greenwallet.sit
 
 # Application definition
 
-SITE_ID = 2
-
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -43,30 +41,16 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'django.contrib.sites',
 
     'transaction',
     'social_auth',
 
     'rest_framework',
     'corsheaders',
-
-    'allauth',
 ]
 
-SOCIALACCOUNT_PROVIDERS = {
-    'google': {
-        'SCOPE': [
-            'profile',
-            'email'
-        ],
-        'AUTH_PARAMS': {
-            'access_type': 'online'
-        }
-    }
-}
-
 MIDDLEWARE = [
+    'server.performance.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
@@ -77,6 +61,44 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# API-only profile
+# The JSON API authenticates by JWT header, so sessions, CSRF, messages and the admin only serve the admin site.
+# API_ONLY=True leaves them out of the workers; run a second process without it to mount the admin separately.
+
+API_ONLY = os.environ.get('API_ONLY', '') == 'True'
+ADMIN_APPS = [
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+]
+ADMIN_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+if API_ONLY:
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in ADMIN_APPS]
+    MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in ADMIN_MIDDLEWARE]
+    # Nothing keeps sessions any more; this only spares the test client's logout() a sessions table
+    SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'social_auth.authentication.GoogleJWTAuthentication',
+    ],
+    # ORJSON_RENDERER_ENABLED swaps in orjson (pip install orjson) for the same bytes, faster
+    'DEFAULT_RENDERER_CLASSES': [
+        'server.renderers.ORJSONRenderer' if os.environ.get('ORJSON_RENDERER_ENABLED', '') == 'True' else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+if API_ONLY:
+    # The browsable API is for people poking at it from a browser, with templates and static files behind it
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].remove('rest_framework.renderers.BrowsableAPIRenderer')
+
 ROOT_URLCONF = 'server.urls'
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_ALL_ORIGINS = True
@@ -104,10 +126,75 @@ WSGI_APPLICATION = 'server.wsgi.application'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
 # PostgreSQL
+# Connections are kept for DB_CONN_MAX_AGE seconds (0 closes them after every request, 'None' keeps them forever)
+# and checked before reuse. Behind PgBouncer in transaction pooling mode set DB_POOLER=pgbouncer: a pooled
+# transaction can land on a different server connection, so server-side cursors (QuerySet.iterator) are disabled.
+
+DB_CONN_MAX_AGE = os.environ.get('DB_CONN_MAX_AGE', '60')
+DB_POOLER = os.environ.get('DB_POOLER', '')
+
+DB_CONNECTION_OPTIONS = {
+    'conn_max_age': None if DB_CONN_MAX_AGE == 'None' else int(DB_CONN_MAX_AGE),
+    'conn_health_checks': os.environ.get('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+    'disable_server_side_cursors': DB_POOLER == 'pgbouncer',
+}
+
 DATABASES = {
-    'default': dj_database_url.config(default=os.environ.get('DB_URL'))
+    'default': dj_database_url.config(default=os.environ.get('DB_URL'), **DB_CONNECTION_OPTIONS)
 }
 
+# Read replicas
+# DB_REPLICA_URLS is a comma separated list; views that opt in send their reads to one of them (see server.routers).
+# Anything written in the last DB_REPLICA_PIN_SECONDS is read from the primary, so writers see their own changes despite lag.
+# The pins are kept in the cache, which must then be shared by all workers.
+
+DB_REPLICAS = []
+for index, url in enumerate(url for url in os.environ.get('DB_REPLICA_URLS', '').split(',') if url):
+    DATABASES[f'replica_{index}'] = dj_database_url.parse(url, **DB_CONNECTION_OPTIONS)
+    DB_REPLICAS.append(f'replica_{index}')
+DB_REPLICA_PIN_SECONDS = float(os.environ.get('DB_REPLICA_PIN_SECONDS', 5))
+DATABASE_ROUTERS = ['server.routers.ReplicaRouter']
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'greenwallet'),
+    }
+}
+
+# Response caching
+# Writes invalidate cached responses by bumping versions in the cache, which only the workers sharing it see.
+# Unset, it is on with a shared CACHE_BACKEND (Redis, Memcached) and off with LocMemCache, where other workers would
+# serve stale lists; RESPONSE_CACHE_ENABLED=True forces it on for a single worker process.
+
+RESPONSE_CACHE_ENABLED = {'True': True, 'False': False}.get(os.environ.get('RESPONSE_CACHE_ENABLED', ''))
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 5 * 60))
+RESPONSE_CACHE_STATS_ENABLED = os.environ.get('RESPONSE_CACHE_STATS_ENABLED', '') == 'True'
+
+# Group deletion
+# Deleted groups are hidden at once and their rows left for a scheduled `purge_deleted_groups` to remove.
+# GROUP_PURGE_DEFERRED=False purges inside the DELETE request instead, for installs with nothing to run the command.
+
+GROUP_PURGE_DEFERRED = os.environ.get('GROUP_PURGE_DEFERRED', 'True') == 'True'
+GROUP_PURGE_CHUNK_SIZE = int(os.environ.get('GROUP_PURGE_CHUNK_SIZE', 5000))
+
+# Realtime events
+# The in-process broker only reaches clients connected to the same worker; point this at another backend to fan out wider
+
+EVENT_BROKER = os.environ.get('EVENT_BROKER', 'transaction.events.InProcessBroker')
+EVENT_STREAM_KEEPALIVE = int(os.environ.get('EVENT_STREAM_KEEPALIVE', 15))
+
+# Performance instrumentation
+# Server-Timing exposes view and DB timings to clients, so it is only sent when SERVER_TIMING_ENABLED=True
+
+SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', '') == 'True'
+PERF_METRICS_ENABLED = os.environ.get('PERF_METRICS_ENABLED', '') == 'True'
+PERF_SLOW_QUERY_MS = float(os.environ.get('PERF_SLOW_QUERY_MS', 100))
+PERF_N_PLUS_ONE_THRESHOLD = int(os.environ.get('PERF_N_PLUS_ONE_THRESHOLD', 10))
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -148,8 +235,3 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
-
-AUTHENTICATION_BACKENDS = (
-    'django.contrib.auth.backends.ModelBackend',
-    'allauth.account.auth_backends.AuthenticationBackend',
-)
@@ -0,0 +1,9 @@
+"""
+Settings for the test suite: python manage.py test --settings=server.settings_test
+"""
+import dj_database_url
+
+from .settings import *  # pylint: disable=W0401,W0614
+
+# A separate database standing in for a lagging replica; tests route to it with override_settings(DB_REPLICAS=['replica'])
+DATABASES['replica'] = dj_database_url.parse('sqlite://:memory:')
@@ -14,11 +14,19 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
 
+from .performance import PerformanceMetrics
+
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('social_auth/', include(('social_auth.urls','social_auth'),namespace='social_auth')),
+    path('metrics', PerformanceMetrics.as_view(), name='Performance Metrics'),
     path('transaction/', include(('transaction.urls','transaction'), namespace='transaction')),
 ]
+
+# Left out of API_ONLY workers; see server/settings.py
+if 'django.contrib.admin' in settings.INSTALLED_APPS:
+    from django.contrib import admin
+
+    urlpatterns.append(path('admin/', admin.site.urls))
@@ -0,0 +1,38 @@
+import jwt
+
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+from .models import GoogleUser
+from .services import verify_jwt_token
+
+class GoogleJWTAuthentication(BaseAuthentication):
+    keyword = b'bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword:
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed('Invalid token header')
+
+        try:
+            jwt_token = auth[1].decode()
+        except UnicodeError as exc:
+            raise AuthenticationFailed('Invalid token header') from exc
+
+        try:
+            jwt_data = verify_jwt_token(jwt_token)
+        except jwt.InvalidTokenError as exc:
+            raise AuthenticationFailed('Invalid token') from exc
+
+        try:
+            # pylint: disable=E1101
+            user = GoogleUser.objects.get(email=jwt_data.get('email'))
+        except GoogleUser.DoesNotExist as exc:
+            raise AuthenticationFailed('No such user') from exc
+
+        return (user, jwt_token)
+
+    def authenticate_header(self, request):
+        return 'Bearer'
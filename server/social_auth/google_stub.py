@@ -0,0 +1,74 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+class GoogleStubHandler(BaseHTTPRequestHandler):
+    """Answers Google's token and userinfo calls; the code `ada` logs in as ada@example.com."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        time.sleep(self.server.latency)
+        length = int(self.headers.get('Content-Length', 0))
+        code = parse_qs(self.rfile.read(length).decode()).get('code', [''])[0]
+        if urlparse(self.path).path != '/token' or not code:
+            self.send_json(400, {'error': 'invalid_grant'})
+            return
+        self.send_json(200, {'access_token': f'access-{code}'})
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        url = urlparse(self.path)
+        access_token = parse_qs(url.query).get('access_token', [''])[0]
+        if url.path != '/userinfo' or not access_token.startswith('access-'):
+            self.send_json(401, {'error': 'invalid_token'})
+            return
+        name = access_token.removeprefix('access-')
+        self.send_json(200, {
+            'email': f'{name}@example.com',
+            'given_name': name.title(),
+            'family_name': 'Stub',
+            'picture': f'https://example.com/{name}.png',
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+class GoogleStubServer:
+    def __init__(self, latency:float=0.0):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), GoogleStubHandler)
+        self.server.daemon_threads = True
+        self.server.latency = latency
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address
+        return f'http://{host}:{port}'
+
+    @property
+    def token_url(self) -> str:
+        return f'{self.base_url}/token'
+
+    @property
+    def user_info_url(self) -> str:
+        return f'{self.base_url}/userinfo'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,59 @@
+import asyncio
+import os
+import statistics
+import time
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from social_auth.google_stub import GoogleStubServer
+
+class Command(BaseCommand):
+    help = 'Benchmark Google logins per second against a local token/userinfo stub, using a throwaway test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--upstream-latency', type=float, default=0.05, help='Seconds the stub waits before each Google response')
+
+    def handle(self, *args, **options):
+        os.environ.setdefault('SECRET_KEY', 'bench-secret')
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with GoogleStubServer(latency=options['upstream_latency']) as stub, \
+                    mock.patch('social_auth.services.GOOGLE_ACCESS_TOKEN_OBTAIN_URL', stub.token_url), \
+                    mock.patch('social_auth.services.GOOGLE_USER_INFO_URL', stub.user_info_url):
+                for concurrency in sorted({1, options['concurrency']}):
+                    self.report(concurrency, asyncio.run(self.run(options['logins'], concurrency)))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    async def run(self, logins, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def login(index):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get('/social_auth/google/', {'code': f'user{index % 50}'})
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 302, response.status_code
+
+        started = time.perf_counter()
+        await asyncio.gather(*(login(index) for index in range(logins)))
+        return time.perf_counter() - started, latencies
+
+    def report(self, concurrency, result):
+        elapsed, latencies = result
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f'concurrency={concurrency:<4} logins/s={len(latencies) / elapsed:8.1f} '
+            f'p50={statistics.median(latencies) * 1000:7.1f}ms p99={p99 * 1000:7.1f}ms'
+        )
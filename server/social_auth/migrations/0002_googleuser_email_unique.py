@@ -0,0 +1,38 @@
+# Generated by Django 4.2.4 on 2026-10-18 08:26
+
+from django.db import migrations, models
+
+
+def merge_duplicate_users(apps, schema_editor):
+    # Concurrent first logins could create several rows per email; keep the oldest
+    GoogleUser = apps.get_model('social_auth', 'GoogleUser')
+    TransactionGroup = apps.get_model('transaction', 'TransactionGroup')
+
+    duplicated = (
+        GoogleUser.objects.values('email')
+        .annotate(count=models.Count('uuid'))
+        .filter(count__gt=1)
+        .values_list('email', flat=True)
+    )
+    for email in list(duplicated):
+        users = list(GoogleUser.objects.filter(email=email).order_by('created'))
+        keeper, duplicates = users[0], users[1:]
+        TransactionGroup.objects.filter(owner__in=duplicates).update(owner=keeper)
+        GoogleUser.objects.filter(uuid__in=[user.uuid for user in duplicates]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_auth', '0001_initial'),
+        ('transaction', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_users, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='googleuser',
+            name='email',
+            field=models.EmailField(max_length=254, unique=True),
+        ),
+    ]
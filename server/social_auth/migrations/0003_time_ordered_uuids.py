@@ -0,0 +1,19 @@
+# Generated by Django 4.2.4 on 2026-10-18 08:32
+
+from django.db import migrations, models
+import server.ids
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_auth', '0002_googleuser_email_unique'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='googleuser',
+            name='uuid',
+            field=models.UUIDField(default=server.ids.uuid7, editable=False, primary_key=True, serialize=False, unique=True),
+        ),
+    ]
@@ -1,16 +1,21 @@
 from django.db import models
-import uuid
+
+from server.ids import uuid7
 
 class GoogleUser(models.Model):
-    uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True, primary_key=True)
+    uuid = models.UUIDField(default=uuid7, editable=False, unique=True, primary_key=True)
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
-    email = models.EmailField()
+    email = models.EmailField(unique=True)
     picture = models.URLField(max_length=1000)
     balance = models.IntegerField(default=0)
     expenses = models.IntegerField(default=0)
     income = models.IntegerField(default=0)
     created = models.DateTimeField(auto_now_add=True)
 
+    # Lets DRF permission classes treat a resolved GoogleUser as request.user
+    is_authenticated = True
+    is_anonymous = False
+
     def __str__(self):
         return str(self.email)
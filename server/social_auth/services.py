@@ -1,21 +1,73 @@
-import requests
+import asyncio
 import os
 import jwt
+import threading
+import weakref
 
-from typing import Dict, Any
+from asgiref.sync import sync_to_async
+from cachetools import TTLCache
+
+from typing import Dict, Any, List
 
 from django.core.exceptions import ValidationError
 from django.shortcuts import redirect
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
 
 from .models import GoogleUser
+from transaction.caching import invalidate, owner_scope
 
 from urllib.parse import urlencode
 
-GOOGLE_ACCESS_TOKEN_OBTAIN_URL = 'https://oauth2.googleapis.com/token'
-GOOGLE_USER_INFO_URL = 'https://www.googleapis.com/oauth2/v3/userinfo'
+GOOGLE_ACCESS_TOKEN_OBTAIN_URL = os.environ.get('GOOGLE_ACCESS_TOKEN_OBTAIN_URL', 'https://oauth2.googleapis.com/token')
+GOOGLE_USER_INFO_URL = os.environ.get('GOOGLE_USER_INFO_URL', 'https://www.googleapis.com/oauth2/v3/userinfo')
+
+GOOGLE_HTTP_TIMEOUT = {'timeout': 5.0, 'connect': 2.0}
+GOOGLE_HTTP_LIMITS = {'max_connections': 100, 'max_keepalive_connections': 20, 'keepalive_expiry': 30.0}
+
+# httpx clients are bound to the event loop that opened their connections.
+# httpx itself is imported on first login: it is a large import that only this exchange needs,
+# and the authentication class loads this module in every worker.
+google_clients = weakref.WeakKeyDictionary()
+
+# WSGI runs each async view in a new event loop that a per-loop client would not outlive,
+# so those workers share one thread-safe sync client instead
+google_sync_client = None
+google_sync_client_lock = threading.Lock()
+
+VERIFIED_TOKEN_CACHE_SIZE = 4096
+VERIFIED_TOKEN_CACHE_TTL = 5 * 60
+
+verified_tokens = TTLCache(maxsize=VERIFIED_TOKEN_CACHE_SIZE, ttl=VERIFIED_TOKEN_CACHE_TTL)
+verified_tokens_lock = threading.Lock()
+
+def get_google_client() -> 'httpx.AsyncClient':
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    client = google_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(timeout=httpx.Timeout(**GOOGLE_HTTP_TIMEOUT), limits=httpx.Limits(**GOOGLE_HTTP_LIMITS))
+        google_clients[loop] = client
+    return client
+
+def get_google_sync_client() -> 'httpx.Client':
+    global google_sync_client # pylint: disable=W0603
+    with google_sync_client_lock:
+        if google_sync_client is None:
+            import httpx
+
+            google_sync_client = httpx.Client(timeout=httpx.Timeout(**GOOGLE_HTTP_TIMEOUT), limits=httpx.Limits(**GOOGLE_HTTP_LIMITS))
+    return google_sync_client
+
+async def google_request(method:str, url:str, *, asgi:bool, **kwargs) -> 'httpx.Response':
+    if asgi:
+        return await get_google_client().request(method, url, **kwargs)
+    return await sync_to_async(get_google_sync_client().request, thread_sensitive=False)(method, url, **kwargs)
+
+async def google_get_access_token(*,code:str, redirect_uri:str, asgi:bool) -> str:
+    import httpx
 
-def google_get_access_token(*,code:str, redirect_uri:str) -> str:
     data = {
         'code': code,
         'client_id': os.environ.get('GOOGLE_CLIENT_ID'),
@@ -24,26 +76,34 @@ def google_get_access_token(*,code:str, redirect_uri:str) -> str:
         'grant_type': 'authorization_code'
     }
 
-    response = requests.post(GOOGLE_ACCESS_TOKEN_OBTAIN_URL, data=data)
+    try:
+        response = await google_request('POST', GOOGLE_ACCESS_TOKEN_OBTAIN_URL, data=data, asgi=asgi)
+    except httpx.HTTPError as exc:
+        raise ValidationError("Failed to obtain access token from Google") from exc
 
-    if not response.ok:
+    if not response.is_success:
         raise ValidationError("Failed to obtain access token from Google")
     
     access_token = response.json()['access_token']
 
     return access_token
 
-def google_get_user_info(*, access_token:str) -> Dict[str,Any]:
-    response = requests.get(GOOGLE_USER_INFO_URL,params={'access_token':access_token})
+async def google_get_user_info(*, access_token:str, asgi:bool) -> Dict[str,Any]:
+    import httpx
 
-    if not response.ok:
+    try:
+        response = await google_request('GET', GOOGLE_USER_INFO_URL, params={'access_token':access_token}, asgi=asgi)
+    except httpx.HTTPError as exc:
+        raise ValidationError('Could not get user info from Google') from exc
+
+    if not response.is_success:
         raise ValidationError('Could not get user info from Google')
     
     user_data = response.json()
 
     return user_data
 
-def create_jwt_token(validated_data):
+async def create_jwt_token(validated_data, *, asgi:bool=True):
     code = validated_data.get('code')
     error = validated_data.get('error')
 
@@ -56,9 +116,9 @@ def create_jwt_token(validated_data):
     domain = os.environ.get('BASE_BACKEND_URL')
     redirect_uri = f'{domain}/social_auth/google/'
 
-    access_token = google_get_access_token(code=code,redirect_uri=redirect_uri)
+    access_token = await google_get_access_token(code=code,redirect_uri=redirect_uri,asgi=asgi)
 
-    user_data = google_get_user_info(access_token=access_token)
+    user_data = await google_get_user_info(access_token=access_token,asgi=asgi)
 
     profile_data = {
     'email': user_data['email'],
@@ -67,41 +127,49 @@ def create_jwt_token(validated_data):
     'picture': user_data.get('picture')
     }
 
-    # Register/Update user in Django Admin
-    if not User.objects.filter(username=profile_data['email']).exists():
-        user = User.objects.create_user(profile_data['email'],email=profile_data['email'],password=None,first_name=profile_data['given_name'],last_name=profile_data['family_name'])
-        user.save()
-    else:
-        user = User.objects.get(username=profile_data['email'])
-        user.username = profile_data['email']
-        user.email = profile_data['email']
-        user.first_name = profile_data['given_name']
-        user.last_name = profile_data['family_name']
-        user.save()
-
-    # Register/Update user in PostgreSQL db
-    # pylint: disable=E1101
-    if not GoogleUser.objects.filter(email=profile_data['email']).exists():
-        user = GoogleUser(first_name=profile_data['given_name'],last_name=profile_data['family_name'],email=profile_data['email'],picture=profile_data['picture'])
-        user.save()
-    else:
-        # pylint: disable=E1101
-        user = GoogleUser.objects.get(email=profile_data['email'])
-        user.first_name = profile_data['given_name']
-        user.last_name = profile_data['family_name']
-        user.email = profile_data['email']
-        user.picture = profile_data['picture']
-        user.save()
+    await sync_to_async(provision_user)(profile_data)
 
     jwt_token = jwt.encode(profile_data,os.environ.get('SECRET_KEY'), algorithm="HS256")
 
     return jwt_token
 
+def update_changed_fields(instance, values:Dict[str,Any]) -> List[str]:
+    changed = [field for field, value in values.items() if getattr(instance, field) != value]
+    for field in changed:
+        setattr(instance, field, values[field])
+    if changed:
+        instance.save(update_fields=changed)
+    return changed
+
+def provision_user(profile_data):
+    # get_or_create leans on the unique username/email, so concurrent first logins cannot duplicate rows
+    email = profile_data['email']
+    names = {
+        'first_name': profile_data['given_name'] or '',
+        'last_name': profile_data['family_name'] or '',
+    }
+
+    # Register/Update user in Django Admin
+    user, created = User.objects.get_or_create(username=email, defaults={'email': email, 'password': make_password(None), **names})
+    if not created:
+        update_changed_fields(user, {'email': email, **names})
+
+    # Register/Update user in PostgreSQL db
+    google_profile = {**names, 'picture': profile_data['picture'] or ''}
+    # pylint: disable=E1101
+    google_user, created = GoogleUser.objects.get_or_create(email=email, defaults=google_profile)
+    if not created and update_changed_fields(google_user, google_profile):
+        invalidate([owner_scope(google_user.uuid)])
+
 def validate_jwt_token(jwt_token):
     return jwt.decode(jwt_token, os.environ.get('SECRET_KEY'), algorithms=['HS256'])
 
-def get_user_data(request):
-    jwt_data = validate_jwt_token(request.headers.get('Authorization').split(' ')[1])
-    print("TOKEN: ",request.headers.get('Authorization').split(' ')[1])
-    print("EMAIL: ",jwt_data['email'])
-    return jwt_data['email']
+def verify_jwt_token(jwt_token):
+    # Signature checks are memoized so repeat requests with the same token skip the HMAC
+    with verified_tokens_lock:
+        jwt_data = verified_tokens.get(jwt_token)
+    if jwt_data is None:
+        jwt_data = validate_jwt_token(jwt_token)
+        with verified_tokens_lock:
+            verified_tokens[jwt_token] = jwt_data
+    return jwt_data
@@ -1,3 +1,172 @@
-from django.test import TestCase
+import asyncio
+import os
+from unittest import mock
 
-# Create your tests here.
+import jwt
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from rest_framework.test import APIClient
+
+from .google_stub import GoogleStubServer
+from .models import GoogleUser
+from . import services
+from .services import provision_user, validate_jwt_token, verified_tokens
+from transaction.models import Transaction, TransactionGroup
+
+SECRET_KEY = 'test-secret'
+
+@override_settings(RESPONSE_CACHE_ENABLED=True)
+@mock.patch.dict(os.environ, {'SECRET_KEY': SECRET_KEY})
+class GetUserDataTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        # pylint: disable=E1101
+        self.user = GoogleUser.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com', picture='https://example.com/ada.png')
+        for name in ('Wallet', 'Savings'):
+            group = TransactionGroup.objects.create(name=name, owner=self.user)
+            Transaction.objects.create(name='Salary', group=group, amount=300)
+            Transaction.objects.create(name='Rent', group=group, amount=-120)
+        token = jwt.encode({'email': self.user.email}, SECRET_KEY, algorithm='HS256')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_summary_is_computed_in_one_aggregate(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/social_auth/user/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['income'], 600)
+        self.assertEqual(response.data['expenses'], -240)
+        self.assertEqual(response.data['balance'], 360)
+
+    def test_repeat_request_only_resolves_the_user(self):
+        self.client.get('/social_auth/user/')
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/social_auth/user/')
+
+        self.assertEqual(response.data['balance'], 360)
+
+    def test_get_does_not_write(self):
+        self.client.get('/social_auth/user/')
+
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.income, self.user.expenses, self.user.balance), (0, 0, 0))
+
+@mock.patch.dict(os.environ, {'SECRET_KEY': SECRET_KEY})
+class GoogleJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        verified_tokens.clear()
+        self.client = APIClient()
+        # pylint: disable=E1101
+        self.user = GoogleUser.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com', picture='https://example.com/ada.png')
+
+    def test_missing_token_is_rejected(self):
+        response = self.client.get('/social_auth/user/')
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_bad_signature_is_rejected(self):
+        token = jwt.encode({'email': self.user.email}, 'wrong-secret', algorithm='HS256')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        response = self.client.get('/social_auth/user/')
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_non_utf8_token_is_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer \xff')
+
+        response = self.client.get('/social_auth/user/')
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['detail'], 'Invalid token header')
+
+    def test_verified_token_is_memoized(self):
+        token = jwt.encode({'email': self.user.email}, SECRET_KEY, algorithm='HS256')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        with mock.patch('social_auth.services.validate_jwt_token', wraps=validate_jwt_token) as validate:
+            self.client.get('/social_auth/user/')
+            self.client.get('/social_auth/user/')
+
+        self.assertEqual(validate.call_count, 1)
+
+@mock.patch.dict(os.environ, {'SECRET_KEY': SECRET_KEY, 'BASE_FRONTEND_URL': 'https://greenwallet.site'})
+class GoogleSocialAuthViewTests(TestCase):
+    def setUp(self):
+        self.stub = GoogleStubServer().__enter__()
+        self.addCleanup(self.stub.__exit__)
+        for name, url in (('GOOGLE_ACCESS_TOKEN_OBTAIN_URL', self.stub.token_url), ('GOOGLE_USER_INFO_URL', self.stub.user_info_url)):
+            patcher = mock.patch(f'social_auth.services.{name}', url)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_login_provisions_user_and_sets_token(self):
+        response = self.client.get('/social_auth/google/', {'code': 'ada'})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], 'https://greenwallet.site/dashboard')
+        payload = jwt.decode(response.cookies['Token'].value, SECRET_KEY, algorithms=['HS256'])
+        self.assertEqual(payload['email'], 'ada@example.com')
+        # pylint: disable=E1101
+        self.assertEqual(GoogleUser.objects.get(email='ada@example.com').first_name, 'Ada')
+
+    def test_wsgi_logins_share_one_pooled_client(self):
+        self.client.get('/social_auth/google/', {'code': 'ada'})
+        client = services.get_google_sync_client()
+        self.client.get('/social_auth/google/', {'code': 'grace'})
+
+        self.assertIs(services.get_google_sync_client(), client)
+        self.assertEqual(len(services.google_clients), 0)
+
+    async def test_asgi_logins_use_the_event_loop_client(self):
+        response = await self.async_client.get('/social_auth/google/', {'code': 'ada'})
+
+        self.assertEqual(response.status_code, 302)
+        client = services.google_clients[asyncio.get_running_loop()]
+        await client.aclose()
+
+    def test_unreachable_google_fails_fast(self):
+        with mock.patch('social_auth.services.GOOGLE_ACCESS_TOKEN_OBTAIN_URL', 'http://127.0.0.1:9/token'):
+            response = self.client.get('/social_auth/google/', {'code': 'ada'})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], 'https://greenwallet.site/login?error=google_unavailable')
+        self.assertNotIn('Token', response.cookies)
+
+    def test_rejected_code_returns_to_login(self):
+        with mock.patch('social_auth.services.GOOGLE_ACCESS_TOKEN_OBTAIN_URL', f'{self.stub.base_url}/revoked'):
+            response = self.client.get('/social_auth/google/', {'code': 'ada'})
+
+        self.assertEqual(response['Location'], 'https://greenwallet.site/login?error=google_unavailable')
+
+class ProvisionUserTests(TestCase):
+    profile = {'email': 'ada@example.com', 'given_name': 'Ada', 'family_name': 'Lovelace', 'picture': 'https://example.com/ada.png'}
+
+    def test_first_login_creates_both_users(self):
+        provision_user(self.profile)
+
+        user = User.objects.get(username='ada@example.com')
+        self.assertFalse(user.has_usable_password())
+        # pylint: disable=E1101
+        self.assertEqual(GoogleUser.objects.get(email='ada@example.com').last_name, 'Lovelace')
+
+    def test_repeat_login_only_reads(self):
+        provision_user(self.profile)
+
+        with self.assertNumQueries(2):
+            provision_user(self.profile)
+
+    def test_changed_profile_writes_only_what_changed(self):
+        provision_user(self.profile)
+
+        with self.assertNumQueries(3):
+            provision_user({**self.profile, 'picture': 'https://example.com/ada-2.png'})
+
+        # pylint: disable=E1101
+        self.assertEqual(GoogleUser.objects.get().picture, 'https://example.com/ada-2.png')
+        self.assertEqual(User.objects.count(), 1)
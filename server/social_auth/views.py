@@ -1,60 +1,55 @@
 import os
-import jwt
 
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse
 from django.shortcuts import redirect
-from django.db.models import Q, Sum
+from django.views import View
 
-from rest_framework.views import APIView
 from rest_framework.generics import RetrieveAPIView
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from .services import create_jwt_token, get_user_data
+from .services import create_jwt_token
 from .serializers import InputSerializer, GoogleUserSerializer
-from .models import GoogleUser
 
-from transaction.models import Transaction
-from transaction.serializers import TransactionSerializer
+from transaction.caching import CachedResponseMixin, owner_scope
+from transaction.services import summarize_owner
 
-class GoogleSocialAuthView(APIView):
-    def get(self, request):
+class GoogleSocialAuthView(View):
+    # Async so the Google round trips do not hold a worker while they wait
+    async def get(self, request):
         input_serializer = InputSerializer(data=request.GET)
-        input_serializer.is_valid(raise_exception=True)
+        if not input_serializer.is_valid():
+            return JsonResponse(input_serializer.errors, status=400)
 
         validated_data = input_serializer.validated_data
-        jwt_token = create_jwt_token(validated_data)
+        # Under WSGI this runs in a throwaway event loop, so Google is called through the shared sync client
+        try:
+            jwt_token = await create_jwt_token(validated_data, asgi=isinstance(request, ASGIRequest))
+        except ValidationError:
+            # Google timed out or turned the code down; send the browser back to the login page rather than a 500
+            return redirect(f"{os.environ.get('BASE_FRONTEND_URL')}/login?error=google_unavailable")
 
         response = redirect(f"{os.environ.get('BASE_FRONTEND_URL')}/dashboard")
-        print("TOKEN: ",jwt_token)
         response.set_cookie('Token',jwt_token,domain='.greenwallet.site',samesite=None,secure=False,httponly=False, max_age = 60 * 24 * 60 * 60)
 
         return response
 
-class GetUserData(RetrieveAPIView):
-    def get(self,request):
-        email = get_user_data(request)
-        # pylint: disable=E1101
-        user = GoogleUser.objects.get(email=email)
+class GetUserData(CachedResponseMixin, RetrieveAPIView):
+    permission_classes = [IsAuthenticated]
+    replica_reads = True
 
-        transactions = Transaction.objects.filter(group__owner__email=email)
-        
-        user.income = transactions.aggregate(value=Sum('amount',filter=Q(amount__gt=0))).get('value')
-        user.expenses = transactions.aggregate(value=Sum('amount',filter=Q(amount__lt=0))).get('value')
-
-        if user.income is None:
-            user.income = 0
-            if user.expenses is None:
-                user.expenses = 0
-                user.balance = 0
-            else:
-                user.balance = user.expenses
-        else:
-            if user.expenses is None:
-                user.expenses = 0
-                user.balance = user.income
-            else:
-                user.balance = transactions.aggregate(value=Sum('amount')).get('value')
-                
-        user.save()
+    def get_cache_scopes(self):
+        return [owner_scope(self.request.user.uuid)]
+
+    def retrieve(self, request, *args, **kwargs):
+        user = request.user
+
+        summary = summarize_owner(user)
+        user.income = summary['income']
+        user.expenses = summary['expenses']
+        user.balance = summary['balance']
 
         serializer = GoogleUserSerializer(user)
 
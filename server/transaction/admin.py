@@ -1,13 +1,18 @@
 from django.contrib import admin
-from .models import TransactionGroup, Transaction
+from .models import ArchivedTransaction, TransactionGroup, Transaction
 
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ('name','group','amount')
     list_filter = ['group']
     search_fields = ['name']
 
+class ArchivedTransactionAdmin(admin.ModelAdmin):
+    list_display = ('name','group','amount','created')
+    list_filter = ['group']
+
 class TransactionGroupAdmin(admin.ModelAdmin):
     list_display = ('name','owner')
 
 admin.site.register(TransactionGroup, TransactionGroupAdmin)
 admin.site.register(Transaction, TransactionAdmin)
+admin.site.register(ArchivedTransaction, ArchivedTransactionAdmin)
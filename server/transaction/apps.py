@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
+def create_search_index(sender, using, **kwargs):
+    from .search import ensure_sqlite_search_index
+    ensure_sqlite_search_index(using)
+
 class TransactionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'transaction'
+
+    def ready(self):
+        from .caching import check_replica_cache
+        check_replica_cache()
+        post_migrate.connect(create_search_index, sender=self)
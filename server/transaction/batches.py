@@ -0,0 +1,158 @@
+from typing import Any, Dict, List, Tuple
+
+from django.conf import settings
+from django.db.transaction import atomic
+
+from rest_framework import serializers
+
+from .caching import invalidate_groups
+from .events import BulkTransactionChanges, publish_group_changes
+from .models import Transaction, TransactionGroup
+from .serializers import GROUP_NAME_TAKEN, TransactionGroupSerializer, TransactionImportSerializer, TransactionSerializer
+from .services import purge_groups, record_transaction_changes
+
+CREATE = 'create'
+UPDATE = 'update'
+DELETE = 'delete'
+
+BatchResult = Tuple[bool, List[Dict[str, Any]]]
+
+class GroupBatchDataSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=200)
+
+def validate_operations(operations, data_serializer_class, targets) -> List[Dict[str, Any]]:
+    """Check every operation up front; `targets` maps the uuids the caller may update or delete."""
+    create_serializer = data_serializer_class()
+    update_serializer = data_serializer_class(partial=True)
+    results, seen = [], set()
+
+    for index, operation in enumerate(operations):
+        result = {'index': index, 'op': operation['op'], 'uuid': operation.get('uuid')}
+        results.append(result)
+        try:
+            if operation['op'] != CREATE:
+                if operation['uuid'] in seen:
+                    raise serializers.ValidationError({'uuid': ['Appears in more than one operation']})
+                seen.add(operation['uuid'])
+                if operation['uuid'] not in targets:
+                    raise serializers.ValidationError({'uuid': ['Not found']})
+            if operation['op'] == CREATE:
+                result['validated'] = create_serializer.run_validation(operation.get('data', {}))
+            elif operation['op'] == UPDATE:
+                result['validated'] = update_serializer.run_validation(operation.get('data', {}))
+        except serializers.ValidationError as exc:
+            result['status'] = 'error'
+            result['errors'] = exc.detail
+
+    return results
+
+def check_group_names(owner, results, deleted_ids) -> None:
+    """Fail creates and renames that would clash with another of the owner's groups, as the owner/name constraint would."""
+    named = [result for result in results if 'name' in result.get('validated', {})]
+    # pylint: disable=E1101
+    taken = dict(
+        TransactionGroup.objects.filter(owner=owner, name__in={result['validated']['name'] for result in named})
+        .exclude(uuid__in=deleted_ids).values_list('name', 'uuid')
+    )
+    for result in named:
+        name = result['validated']['name']
+        if name in taken and taken[name] != result['uuid']:
+            result['status'] = 'error'
+            result['errors'] = {'name': [GROUP_NAME_TAKEN]}
+        else:
+            # Operation indexes never equal a uuid, so a later create or rename to this name clashes too
+            taken[name] = result['index']
+
+def finish(results, representations) -> BatchResult:
+    ok = not any(result.get('status') == 'error' for result in results)
+    for result in results:
+        result.pop('validated', None)
+        if ok:
+            result['status'] = {CREATE: 'created', UPDATE: 'updated', DELETE: 'deleted'}[result['op']]
+            if result['uuid'] in representations:
+                result['data'] = representations[result['uuid']]
+    return ok, results
+
+def apply_transaction_batch(*, owner, operations) -> BatchResult:
+    target_ids = [operation['uuid'] for operation in operations if operation['op'] != CREATE]
+
+    with atomic():
+        # pylint: disable=E1101
+        targets = Transaction.objects.select_for_update(of=('self',)).filter(group__owner=owner, group__deleted=False).in_bulk(target_ids)
+        results = validate_operations(operations, TransactionImportSerializer, targets)
+
+        group_ids = {result['validated']['group'] for result in results if 'group' in result.get('validated', {})}
+        owned_groups = set(TransactionGroup.objects.filter(owner=owner, uuid__in=group_ids).values_list('uuid', flat=True))
+        for result in results:
+            group_id = result.get('validated', {}).get('group')
+            if group_id is not None and group_id not in owned_groups:
+                result['status'] = 'error'
+                result['errors'] = {'group': ['Unknown transaction group']}
+
+        if any(result.get('status') == 'error' for result in results):
+            return finish(results, {})
+
+        created, updated, previous, deleted = [], [], [], []
+        for result in results:
+            data = result.get('validated', {})
+            if result['op'] == CREATE:
+                transaction = Transaction(name=data['name'], amount=data['amount'], group_id=data['group'])
+                result['uuid'] = transaction.uuid
+                created.append(transaction)
+            elif result['op'] == UPDATE:
+                transaction = targets[result['uuid']]
+                previous.append(Transaction(uuid=transaction.uuid, group_id=transaction.group_id, amount=transaction.amount, created=transaction.created))
+                for field, value in data.items():
+                    setattr(transaction, 'group_id' if field == 'group' else field, value)
+                updated.append(transaction)
+            else:
+                deleted.append(targets[result['uuid']])
+
+        Transaction.objects.bulk_create(created)
+        Transaction.objects.bulk_update(updated, ['name', 'group', 'amount'])
+        changes = BulkTransactionChanges()
+        record_transaction_changes(added=created + updated, removed=previous + deleted, bulk=changes)
+        changes.publish()
+        Transaction.objects.filter(uuid__in=[transaction.uuid for transaction in deleted]).delete()
+
+    representations = {transaction.uuid: TransactionSerializer(transaction).data for transaction in created + updated}
+    return finish(results, representations)
+
+def apply_group_batch(*, owner, operations) -> BatchResult:
+    target_ids = [operation['uuid'] for operation in operations if operation['op'] != CREATE]
+
+    with atomic():
+        # pylint: disable=E1101
+        targets = TransactionGroup.objects.select_for_update().filter(owner=owner).in_bulk(target_ids)
+        results = validate_operations(operations, GroupBatchDataSerializer, targets)
+        check_group_names(owner, results, [result['uuid'] for result in results if result['op'] == DELETE])
+
+        if any(result.get('status') == 'error' for result in results):
+            return finish(results, {})
+
+        created, updated, deleted = [], [], []
+        for result in results:
+            data = result.get('validated', {})
+            if result['op'] == CREATE:
+                group = TransactionGroup(name=data['name'], owner=owner)
+                result['uuid'] = group.uuid
+                created.append(group)
+            elif result['op'] == UPDATE:
+                group = targets[result['uuid']]
+                group.name = data.get('name', group.name)
+                updated.append(group)
+            else:
+                deleted.append(targets[result['uuid']])
+
+        # Deletes go first so their names are free for the creates and renames in the same batch
+        TransactionGroup.objects.filter(uuid__in=[group.uuid for group in deleted]).update(deleted=True)
+        TransactionGroup.objects.bulk_update(updated, ['name'])
+        TransactionGroup.objects.bulk_create(created)
+        invalidate_groups([group.uuid for group in created + updated + deleted])
+        publish_group_changes(saved=created + updated, deleted=deleted)
+
+    if deleted and not settings.GROUP_PURGE_DEFERRED:
+        purge_groups([group.uuid for group in deleted])
+
+    representations = {group.uuid: TransactionGroupSerializer(group).data for group in created + updated}
+    return finish(results, representations)
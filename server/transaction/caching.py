@@ -0,0 +1,167 @@
+import hashlib
+import time
+from collections import Counter
+from typing import Dict, Iterable, List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db.transaction import on_commit
+
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .models import TransactionGroup
+from server.routers import reading_from_replica
+
+CACHE_PREFIX = 'greenwallet'
+
+# Backends whose entries no other worker process can see
+PROCESS_LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache')
+
+cache_stats = Counter(hits=0, misses=0, not_modified=0)
+
+def owner_scope(owner_id) -> str:
+    return f'owner:{owner_id}'
+
+def group_scope(group_id) -> str:
+    return f'group:{group_id}'
+
+def transaction_scope(transaction_id) -> str:
+    return f'transaction:{transaction_id}'
+
+def version_key(scope:str) -> str:
+    return f'{CACHE_PREFIX}:version:{scope}'
+
+def get_versions(scopes:Iterable[str]) -> Dict[str, int]:
+    scopes = list(scopes)
+    found = cache.get_many([version_key(scope) for scope in scopes])
+    versions = {}
+    for scope in scopes:
+        key = version_key(scope)
+        if key not in found:
+            # A clock-based start can never collide with versions of an evicted key
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+        versions[scope] = found[key]
+    return versions
+
+def is_cache_shared() -> bool:
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+def response_cache_enabled() -> bool:
+    if settings.RESPONSE_CACHE_ENABLED is None:
+        return is_cache_shared()
+    return settings.RESPONSE_CACHE_ENABLED
+
+def check_replica_cache() -> None:
+    # A pin only one worker can see would send the other workers' reads of fresh writes to a lagging replica
+    if settings.DB_REPLICAS and not is_cache_shared():
+        raise ImproperlyConfigured('DB_REPLICA_URLS needs a CACHE_BACKEND shared by every worker (Redis or Memcached), not '
+                                   f"{settings.CACHES['default']['BACKEND']}")
+
+def pin_key(scope:str) -> str:
+    return f'{CACHE_PREFIX}:pin:{scope}'
+
+def is_pinned(scopes:Iterable[str]) -> bool:
+    # Recently written scopes are read from the primary until the replicas have caught up
+    return bool(cache.get_many([pin_key(scope) for scope in scopes]))
+
+def bump_versions(scopes:Iterable[str]) -> None:
+    scopes = set(scopes)
+    for scope in scopes:
+        key = version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+    if settings.DB_REPLICAS:
+        cache.set_many({pin_key(scope): 1 for scope in scopes}, settings.DB_REPLICA_PIN_SECONDS)
+
+def invalidate(scopes:Iterable[str]) -> None:
+    # Bump after commit so a concurrent read cannot cache pre-commit data under the new version
+    scopes = list(scopes)
+    on_commit(lambda: bump_versions(scopes))
+
+def group_owners(group_ids:Iterable) -> Dict:
+    # pylint: disable=E1101
+    return dict(TransactionGroup.all_objects.filter(uuid__in=set(group_ids)).values_list('uuid', 'owner_id'))
+
+def invalidate_groups(group_ids:Iterable, extra_scopes:Iterable[str]=(), owners:Dict=None) -> None:
+    group_ids = set(group_ids)
+    if owners is None:
+        owners = group_owners(group_ids)
+    scopes = [group_scope(group_id) for group_id in group_ids]
+    scopes += [owner_scope(owner_id) for owner_id in set(owners.values())]
+    invalidate(scopes + list(extra_scopes))
+
+def make_etag(data) -> str:
+    return '"%s"' % hashlib.md5(JSONRenderer().render(data)).hexdigest()
+
+def etag_matches(request, etag:str) -> bool:
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    candidates = [candidate.strip().removeprefix('W/') for candidate in header.split(',')]
+    return '*' in candidates or etag in candidates
+
+class CachedResponseMixin:
+    """Serves GET responses from the cache until one of their scopes is invalidated, and answers matching ETags with 304."""
+
+    # Safe, read-only views may serve misses from a replica (see server.routers)
+    replica_reads = False
+
+    def get_cache_scopes(self) -> List[str]:
+        raise NotImplementedError
+
+    def get_data_cache_scopes(self, data) -> List[str]:
+        return []
+
+    def get_response_cache_key(self, request) -> str:
+        user_id = getattr(request.user, 'pk', None)
+        return f'{CACHE_PREFIX}:response:{user_id}:{request.get_full_path()}'
+
+    def get_fresh(self, request, scopes:List[str], *args, **kwargs):
+        if self.replica_reads and settings.DB_REPLICAS and not is_pinned(scopes):
+            with reading_from_replica():
+                return super().get(request, *args, **kwargs)
+        return super().get(request, *args, **kwargs)
+
+    def get(self, request, *args, **kwargs):
+        if not response_cache_enabled():
+            # Nothing is stored, but the ETag still spares clients an unchanged body
+            response = self.get_fresh(request, self.get_cache_scopes(), *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            return self.conditional_response(request, make_etag(data), data)
+
+        key = self.get_response_cache_key(request)
+        entry = cache.get(key)
+
+        if entry is not None and get_versions(entry['versions']) == entry['versions']:
+            cache_stats['hits'] += 1
+            etag, data = entry['etag'], entry['data']
+        else:
+            cache_stats['misses'] += 1
+            scopes = self.get_cache_scopes()
+            versions = get_versions(scopes)
+            response = self.get_fresh(request, scopes, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            versions.update(get_versions(self.get_data_cache_scopes(data)))
+            etag = make_etag(data)
+            cache.set(key, {'versions': versions, 'etag': etag, 'data': data}, settings.RESPONSE_CACHE_TIMEOUT)
+
+        return self.conditional_response(request, etag, data)
+
+    def conditional_response(self, request, etag:str, data):
+        if etag_matches(request, etag):
+            cache_stats['not_modified'] += 1
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        response['ETag'] = etag
+        return response
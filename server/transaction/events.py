@@ -0,0 +1,170 @@
+import asyncio
+import json
+import threading
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Any, Dict, Iterable
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.transaction import on_commit
+from django.utils.module_loading import import_string
+
+SUBSCRIPTION_QUEUE_SIZE = 100
+EVENT_STREAM_RETRY_MS = 5000
+
+class Subscription:
+    """One connected client; events are handed over to the event loop that is serving it."""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIPTION_QUEUE_SIZE)
+        self.overflowed = False
+
+    def deliver(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A client this far behind has to refetch; keep the worker's memory bounded instead
+            self.overflowed = True
+
+    async def get(self):
+        if self.overflowed:
+            self.overflowed = False
+            return {'type': 'resync'}
+        return await self.queue.get()
+
+class InProcessBroker:
+    """Fans events out to subscribers in this worker process only."""
+
+    def __init__(self):
+        self.subscriptions = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def subscribe(self, channel) -> Subscription:
+        subscription = Subscription(channel)
+        with self.lock:
+            self.subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription:Subscription) -> None:
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscriptions[subscription.channel]
+
+    def publish(self, channel, event:Dict[str, Any]) -> None:
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+
+    def connection_count(self) -> int:
+        with self.lock:
+            return sum(len(subscriptions) for subscriptions in self.subscriptions.values())
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.EVENT_BROKER)()
+
+def owner_channel(owner_id) -> str:
+    return f'owner:{owner_id}'
+
+def publish(owner_ids:Iterable, event:Dict[str, Any]) -> None:
+    # Round-trip through JSON now so subscribers get plain data and nothing tied to the ORM
+    event = json.loads(json.dumps(event, cls=DjangoJSONEncoder))
+    owner_ids = set(owner_ids)
+
+    def send():
+        broker = get_broker()
+        for owner_id in owner_ids:
+            broker.publish(owner_channel(owner_id), event)
+
+    on_commit(send)
+
+def transaction_state(transaction) -> Dict[str, Any]:
+    return {'uuid': transaction.uuid, 'name': transaction.name, 'group': transaction.group_id, 'amount': transaction.amount, 'created': transaction.created}
+
+def publish_transaction_changes(*, owners:Dict[Any, Any], added, removed, deltas:Dict[Any, list]) -> None:
+    added_ids = {transaction.uuid for transaction in added}
+    events_by_owner = defaultdict(lambda: {'type': 'transactions', 'saved': [], 'deleted': [], 'groups': {}})
+    for transaction in added:
+        events_by_owner[owners.get(transaction.group_id)]['saved'].append(transaction_state(transaction))
+    for transaction in removed:
+        if transaction.uuid not in added_ids:
+            events_by_owner[owners.get(transaction.group_id)]['deleted'].append(transaction.uuid)
+    for group_id, (income, expenses, balance) in deltas.items():
+        events_by_owner[owners.get(group_id)]['groups'][str(group_id)] = {'income': income, 'expenses': expenses, 'balance': balance}
+
+    for owner_id, event in events_by_owner.items():
+        if owner_id is not None:
+            publish([owner_id], event)
+
+class BulkTransactionChanges:
+    """Collects the group deltas and changed-row counts of a bulk write and publishes them once, without the rows.
+
+    Per-row events would wait in on_commit callbacks until the surrounding transaction commits, so an import
+    would keep every row's state in memory. Subscribers refetch the groups named in the event instead.
+    """
+
+    def __init__(self):
+        self.owners = {}
+        self.deltas = defaultdict(lambda: [0, 0, 0])
+        self.counts = Counter()
+
+    def add(self, *, owners:Dict[Any, Any], added, removed, deltas:Dict[Any, list]) -> None:
+        self.owners.update(owners)
+        added_ids = {transaction.uuid for transaction in added}
+        self.counts.update(transaction.group_id for transaction in added)
+        self.counts.update(transaction.group_id for transaction in removed if transaction.uuid not in added_ids)
+        for group_id, totals in deltas.items():
+            bucket = self.deltas[group_id]
+            for index, value in enumerate(totals):
+                bucket[index] += value
+
+    def publish(self) -> None:
+        events_by_owner = defaultdict(lambda: {'type': 'transactions', 'changed': 0, 'groups': {}})
+        for group_id, count in self.counts.items():
+            events_by_owner[self.owners.get(group_id)]['changed'] += count
+        for group_id, (income, expenses, balance) in self.deltas.items():
+            events_by_owner[self.owners.get(group_id)]['groups'][str(group_id)] = {'income': income, 'expenses': expenses, 'balance': balance}
+
+        for owner_id, event in events_by_owner.items():
+            if owner_id is not None:
+                publish([owner_id], event)
+
+def publish_group_changes(*, saved=(), deleted=()) -> None:
+    events_by_owner = defaultdict(lambda: {'type': 'groups', 'saved': [], 'deleted': []})
+    for group in saved:
+        events_by_owner[group.owner_id]['saved'].append({
+            'uuid': group.uuid, 'name': group.name, 'owner': group.owner_id, 'balance': group.balance,
+            'expenses': group.expenses, 'income': group.income, 'created': group.created,
+        })
+    for group in deleted:
+        events_by_owner[group.owner_id]['deleted'].append(group.uuid)
+
+    for owner_id, event in events_by_owner.items():
+        publish([owner_id], event)
+
+def format_event(event:Dict[str, Any]) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+async def event_stream(owner_id):
+    broker = get_broker()
+    subscription = broker.subscribe(owner_channel(owner_id))
+    try:
+        yield f'retry: {EVENT_STREAM_RETRY_MS}\n\n'
+        yield format_event({'type': 'ready'})
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), timeout=settings.EVENT_STREAM_KEEPALIVE)
+            except asyncio.TimeoutError:
+                # Comments keep proxies from closing idle streams and surface dead clients
+                yield ': keep-alive\n\n'
+                continue
+            yield format_event(event)
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,87 @@
+import codecs
+import csv
+import json
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from django.db.transaction import atomic
+
+from rest_framework import serializers
+
+from .events import BulkTransactionChanges
+from .models import Transaction, TransactionGroup
+from .serializers import TransactionImportSerializer
+from .services import record_transaction_changes
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+Row = Tuple[int, Any]
+
+def read_csv_rows(upload) -> Iterator[Row]:
+    # Lines are decoded as they are read, so the upload never sits in memory whole
+    reader = csv.DictReader(codecs.iterdecode(upload, 'utf-8-sig'))
+    for number, row in enumerate(reader, start=1):
+        yield number, row
+
+def read_ndjson_rows(upload) -> Iterator[Row]:
+    for number, line in enumerate(codecs.iterdecode(upload, 'utf-8-sig'), start=1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, None
+
+READERS = {
+    'csv': read_csv_rows,
+    'ndjson': read_ndjson_rows,
+}
+
+def batched(rows:Iterable[Row], size:int) -> Iterator[List[Row]]:
+    iterator = iter(rows)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def import_transactions(*, owner, rows:Iterable[Row], batch_size:int=None) -> Dict[str, Any]:
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+    row_serializer = TransactionImportSerializer()
+    report = {'created': 0, 'error_count': 0, 'errors': []}
+
+    def reject(number, errors):
+        report['error_count'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'row': number, 'errors': errors})
+
+    changes = BulkTransactionChanges()
+    with atomic():
+        for batch in batched(rows, batch_size):
+            valid = []
+            for number, row in batch:
+                if not isinstance(row, dict):
+                    reject(number, {'non_field_errors': ['Row is not a valid object']})
+                    continue
+                try:
+                    valid.append((number, row_serializer.run_validation(row)))
+                except serializers.ValidationError as exc:
+                    reject(number, exc.detail)
+
+            # One ownership probe per batch instead of a group lookup per row
+            # pylint: disable=E1101
+            owned = set(TransactionGroup.objects.filter(
+                owner=owner, uuid__in={data['group'] for _, data in valid},
+            ).values_list('uuid', flat=True))
+
+            transactions = []
+            for number, data in valid:
+                if data['group'] not in owned:
+                    reject(number, {'group': ['Unknown transaction group']})
+                    continue
+                transactions.append(Transaction(name=data['name'], amount=data['amount'], group_id=data['group']))
+
+            Transaction.objects.bulk_create(transactions)
+            record_transaction_changes(added=transactions, bulk=changes)
+            report['created'] += len(transactions)
+        changes.publish()
+
+    return report
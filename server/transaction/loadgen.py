@@ -0,0 +1,59 @@
+"""HTTP replay for the API benchmark; standard library only so spawned worker processes never load Django."""
+
+import http.client
+import re
+import socket
+import statistics
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+# A request to replay: method, path, headers, body and whether it is an event stream to read up to its first event
+Plan = Dict[str, Any]
+# Latency in seconds, status code and the query count the server reported
+Sample = Tuple[float, int, Optional[int]]
+
+def reported_queries(server_timing:Optional[str]) -> Optional[int]:
+    match = SERVER_TIMING_QUERIES.search(server_timing or '')
+    return int(match.group(1)) if match else None
+
+def connect(host:str, port:int) -> http.client.HTTPConnection:
+    connection = http.client.HTTPConnection(host, port)
+    connection.connect()
+    # Headers and body go out as separate writes; without this each request can stall on a delayed ACK
+    connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return connection
+
+def replay(host:str, port:int, plans:List[Plan]) -> List[Sample]:
+    """Send `plans` in order over one keep-alive connection, reconnecting after event streams."""
+    samples = []
+    connection = connect(host, port)
+    try:
+        for plan in plans:
+            started = time.perf_counter()
+            connection.request(plan['method'], plan['path'], body=plan.get('body'), headers=plan.get('headers', {}))
+            response = connection.getresponse()
+            if plan.get('stream') and response.status == 200:
+                while response.readline() not in (b'', b'event: ready\n'):
+                    pass
+                connection.close()
+                connection = connect(host, port)
+            else:
+                response.read()
+            samples.append((time.perf_counter() - started, response.status, reported_queries(response.getheader('Server-Timing'))))
+    finally:
+        connection.close()
+    return samples
+
+def summarize(samples:List[Sample], elapsed:float) -> Dict[str, Any]:
+    latencies = sorted(sample[0] for sample in samples)
+    queries = [sample[2] for sample in samples if sample[2] is not None]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if sample[1] >= 400),
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 3),
+        'throughput_rps': round(len(samples) / elapsed, 1),
+        'queries_per_request': round(statistics.mean(queries), 2) if queries else None,
+    }
@@ -0,0 +1,43 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.transaction import atomic
+from django.utils import timezone
+
+from transaction.models import Transaction
+from transaction.services import archive_transactions
+
+def month_start(year:int, month:int) -> datetime:
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    return timezone.make_aware(datetime(year, month, 1))
+
+class Command(BaseCommand):
+    help = 'Move transactions from closed months into ArchivedTransaction, freezing those months\' rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='First month to keep live, as YYYY-MM')
+        parser.add_argument('--keep-months', type=int, default=12, help='Months kept live, counting the current one, when --before is not given')
+        parser.add_argument('--batch-size', type=int, default=200, help='Number of groups archived per database transaction')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                before = datetime.strptime(options['before'], '%Y-%m')
+            except ValueError as error:
+                raise CommandError('--before must look like YYYY-MM') from error
+            cutoff = month_start(before.year, before.month)
+        else:
+            today = timezone.localdate()
+            cutoff = month_start(today.year, today.month - options['keep_months'] + 1)
+
+        batch_size = options['batch_size']
+        # pylint: disable=E1101
+        group_ids = list(Transaction.objects.filter(created__lt=cutoff, group__deleted=False).order_by('group').values_list('group', flat=True).distinct())
+
+        archived = 0
+        for offset in range(0, len(group_ids), batch_size):
+            with atomic():
+                archived += archive_transactions(group_ids[offset:offset + batch_size], cutoff)
+            self.stdout.write(f'Archived {min(offset + batch_size, len(group_ids))}/{len(group_ids)} groups')
+
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} transaction(s) created before {cutoff.date()}'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db.transaction import atomic
+
+from transaction.models import Transaction, TransactionGroup, TransactionRollup
+from transaction.services import compute_rollups
+
+class Command(BaseCommand):
+    help = 'Rebuild daily and monthly TransactionRollup rows from the Transaction table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Number of groups rebuilt per database transaction')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        # pylint: disable=E1101
+        group_ids = list(TransactionGroup.objects.order_by('pk').values_list('pk', flat=True))
+
+        created = 0
+        for offset in range(0, len(group_ids), batch_size):
+            batch = group_ids[offset:offset + batch_size]
+            with atomic():
+                # Frozen rollups stand in for archived transactions and cannot be recomputed
+                TransactionRollup.objects.filter(group_id__in=batch, frozen=False).delete()
+                rollups = compute_rollups(Transaction.objects.filter(group_id__in=batch))
+                TransactionRollup.objects.bulk_create(rollups, batch_size=1000)
+            created += len(rollups)
+            self.stdout.write(f'Rebuilt {min(offset + batch_size, len(group_ids))}/{len(group_ids)} groups')
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {created} rollup(s)'))
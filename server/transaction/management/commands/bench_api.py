@@ -0,0 +1,252 @@
+import json
+import multiprocessing
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import urlencode
+
+import uvicorn
+from asgiref.sync import async_to_sync
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from server.ids import uuid7
+from social_auth.google_stub import GoogleStubServer
+from transaction.factories import WORDS, seed_users, user_token
+from transaction.loadgen import replay, reported_queries, summarize
+from transaction.models import ArchivedTransaction, Transaction, TransactionGroup
+
+HOST = '127.0.0.1'
+MULTIPART_BOUNDARY = 'benchboundary'
+
+def json_plan(method, path, token, data=None):
+    plan = {'method': method, 'path': path, 'headers': {'Authorization': f'Bearer {token}'}}
+    if data is not None:
+        plan['body'] = json.dumps(data).encode()
+        plan['headers']['Content-Type'] = 'application/json'
+    return plan
+
+def upload_plan(path, token, filename, content:bytes):
+    body = (
+        f'--{MULTIPART_BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f'Content-Type: text/csv\r\n\r\n'
+    ).encode() + content + f'\r\n--{MULTIPART_BOUNDARY}--\r\n'.encode()
+    headers = {'Authorization': f'Bearer {token}', 'Content-Type': f'multipart/form-data; boundary={MULTIPART_BOUNDARY}'}
+    return {'method': 'POST', 'path': path, 'headers': headers, 'body': body}
+
+class Command(BaseCommand):
+    help = (
+        'Seed synthetic users, then drive every transaction and social_auth endpoint through the Django test client '
+        'and a multi-process HTTP load generator; reports latency, throughput and queries per request as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--groups', type=int, default=5, help='Groups per user')
+        parser.add_argument('--transactions', type=int, default=200, help='Transactions per group')
+        parser.add_argument('--requests', type=int, default=100, help='Requests per endpoint')
+        parser.add_argument('--processes', type=int, default=4, help='HTTP load generator processes')
+        parser.add_argument('--mode', choices=['client', 'http', 'both'], default='both')
+        parser.add_argument('--upstream-latency', type=float, default=0.0, help='Seconds the Google stub waits before each response')
+        parser.add_argument('--output', default='bench_api.json')
+        parser.add_argument('--compare', help='An earlier --output file to print changes against')
+
+    def handle(self, *args, **options):
+        os.environ.setdefault('SECRET_KEY', 'bench-secret')
+        if connection.vendor == 'sqlite':
+            # Concurrent requests over HTTP write from several threads, which an in-memory database cannot take
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.mkdtemp(), 'bench_api.sqlite3')
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with GoogleStubServer(latency=options['upstream_latency']) as stub, \
+                    mock.patch('social_auth.services.GOOGLE_ACCESS_TOKEN_OBTAIN_URL', stub.token_url), \
+                    mock.patch('social_auth.services.GOOGLE_USER_INFO_URL', stub.user_info_url), \
+                    override_settings(SERVER_TIMING_ENABLED=True, RESPONSE_CACHE_STATS_ENABLED=True):
+                started = time.perf_counter()
+                users = seed_users(users=options['users'], groups=options['groups'], transactions=options['transactions'])
+                self.stdout.write(f'seeded {Transaction.objects.count()} transactions in {time.perf_counter() - started:.1f}s')
+
+                results = {'config': {key: options[key] for key in ('users', 'groups', 'transactions', 'requests', 'processes')}}
+                results['config']['database'] = connection.vendor
+                modes = ['client', 'http'] if options['mode'] == 'both' else [options['mode']]
+                for mode in modes:
+                    plans = self.build_plans(users, options['requests'], mode)
+                    if mode == 'client':
+                        results[mode] = self.run_client(plans)
+                    else:
+                        results[mode] = self.run_http(plans, options['processes'])
+                    self.report(mode, results[mode])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+        self.stdout.write(f'wrote {options["output"]}')
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as previous:
+                self.compare(json.load(previous), results)
+
+    def build_plans(self, users, count, mode):
+        """Every endpoint gets `count` requests spread over the seeded users; writes get rows of their own to change.
+
+        Group names carry `mode`, since names are unique per owner and each mode's pass leaves groups behind.
+        """
+        rng = random.Random(count)
+        # pylint: disable=E1101
+        groups = defaultdict(list)
+        group_names = defaultdict(list)
+        for group_id, owner_id, name in TransactionGroup.objects.filter(owner__in=users).values_list('uuid', 'owner_id', 'name'):
+            groups[owner_id].append(str(group_id))
+            group_names[owner_id].append(name)
+        transactions = {
+            user.uuid: [str(transaction_id) for transaction_id in Transaction.objects.filter(group__owner=user).values_list('uuid', flat=True)[:count]]
+            for user in users
+        }
+
+        # Zero amounts keep the seeded totals intact while rows are created, edited and deleted
+        scratch_groups = TransactionGroup.objects.bulk_create([TransactionGroup(name=f'{mode} scratch {index}', owner=rng.choice(users)) for index in range(count * 2)])
+        disposable = Transaction.objects.bulk_create([Transaction(name='Disposable', amount=0, group=group) for group in scratch_groups[:count]])
+        # Archived rows only count through frozen rollups, so these leave every total as it was
+        archived_at = timezone.now() - timedelta(days=730)
+        archived = defaultdict(list)
+        for row in ArchivedTransaction.objects.bulk_create([
+            ArchivedTransaction(uuid=uuid7(), name=f'{rng.choice(WORDS)} archived', group_id=group, amount=0, created=archived_at)
+            for user in users for group in groups[user.uuid]
+        ]):
+            archived[str(row.group_id)].append(str(row.uuid))
+
+        def pick():
+            user = rng.choice(users)
+            return user, user_token(user), rng.choice(groups[user.uuid])
+
+        plans = defaultdict(list)
+        for index in range(count):
+            user, token, group = pick()
+            transaction = rng.choice(transactions[user.uuid])
+            new_transaction = {'name': f'{rng.choice(WORDS)} bench', 'group': group, 'amount': 0}
+            plans['GET transaction/list/<uuid>'].append(json_plan('GET', f'/transaction/list/{group}', token))
+            plans['GET transaction/list/<uuid>/archived'].append(json_plan('GET', f'/transaction/list/{group}/archived', token))
+            plans['GET transaction/archived/<uuid>'].append(json_plan('GET', f'/transaction/archived/{rng.choice(archived[group])}', token))
+            plans['GET transaction/search'].append(json_plan('GET', f'/transaction/search?q={rng.choice(WORDS)[:3]}', token))
+            plans['GET transaction/<uuid>'].append(json_plan('GET', f'/transaction/{transaction}', token))
+            plans['PATCH transaction/<uuid>'].append(json_plan('PATCH', f'/transaction/{transaction}', token, {'name': f'{rng.choice(WORDS)} {index}'}))
+            plans['POST transaction/create-transaction'].append(json_plan('POST', '/transaction/create-transaction', token, new_transaction))
+            plans['POST transaction/batch-transaction'].append(json_plan('POST', '/transaction/batch-transaction', token, {
+                'operations': [{'op': 'create', 'data': new_transaction}, {'op': 'update', 'uuid': transaction, 'data': {'amount': rng.randint(-500, 500)}}],
+            }))
+            plans['GET transaction/list/group/<uuid>'].append(json_plan('GET', f'/transaction/list/group/{user.uuid}', token))
+            plans['GET transaction/group/<uuid>'].append(json_plan('GET', f'/transaction/group/{group}', token))
+            plans['PATCH transaction/group/<uuid>'].append(json_plan('PATCH', f'/transaction/group/{group}', token, {'name': f'{mode} renamed {index}'}))
+            plans['GET transaction/group/lookup'].append(json_plan('GET', f'/transaction/group/lookup?{urlencode({"name": rng.choice(group_names[user.uuid])})}', token))
+            plans['POST transaction/create-group'].append(json_plan('POST', '/transaction/create-group', token, {'name': f'{mode} bench {index}', 'owner': str(user.uuid)}))
+            plans['POST transaction/batch-group'].append(json_plan('POST', '/transaction/batch-group', token, {
+                'operations': [{'op': 'create', 'data': {'name': f'{mode} batch {index}'}}],
+            }))
+            plans['GET transaction/dashboard'].append(json_plan('GET', '/transaction/dashboard', token))
+            plans['GET transaction/events'].append({**json_plan('GET', '/transaction/events', token), 'stream': True})
+            rows = ''.join(f'{group},{rng.choice(WORDS)} import,0\n' for _ in range(20))
+            plans['POST transaction/import'].append(upload_plan('/transaction/import', token, 'bench.csv', f'group,name,amount\n{rows}'.encode()))
+            plans['GET transaction/export/<format>'].append(json_plan('GET', f'/transaction/export/{rng.choice(["csv", "ndjson"])}', token))
+            plans['GET transaction/rollups'].append(json_plan('GET', f'/transaction/rollups?period={rng.choice(["day", "month"])}', token))
+            plans['GET transaction/cache-stats'].append(json_plan('GET', '/transaction/cache-stats', token))
+            plans['GET social_auth/user/'].append(json_plan('GET', '/social_auth/user/', token))
+            plans['GET social_auth/google/'].append({'method': 'GET', 'path': f'/social_auth/google/?code=bench{index % len(users)}', 'headers': {}})
+
+        for transaction, group in zip(disposable, scratch_groups[count:]):
+            plans['DELETE transaction/<uuid>'].append(json_plan('DELETE', f'/transaction/{transaction.uuid}', user_token(transaction.group.owner)))
+            plans['DELETE transaction/group/<uuid>'].append(json_plan('DELETE', f'/transaction/group/{group.uuid}', user_token(group.owner)))
+        return plans
+
+    def run_client(self, plans):
+        client = Client()
+        results = {}
+        for endpoint, endpoint_plans in sorted(plans.items()):
+            samples = []
+            started = time.perf_counter()
+            for plan in endpoint_plans:
+                headers = {f'HTTP_{name.upper().replace("-", "_")}': value for name, value in plan['headers'].items() if name != 'Content-Type'}
+                request_started = time.perf_counter()
+                if plan.get('stream'):
+                    # Event streams are refused under WSGI, so these go through the ASGI handler up to their first event
+                    response = async_to_sync(self.open_stream)(plan['path'], plan['headers'])
+                else:
+                    response = client.generic(
+                        plan['method'], plan['path'], plan.get('body', b''),
+                        content_type=plan['headers'].get('Content-Type', 'application/octet-stream'), **headers,
+                    )
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                samples.append((time.perf_counter() - request_started, response.status_code, reported_queries(response.get('Server-Timing'))))
+            results[endpoint] = summarize(samples, time.perf_counter() - started)
+        return results
+
+    async def open_stream(self, path, headers):
+        response = await AsyncClient().get(path, headers=headers)
+        if response.status_code == 200:
+            content = response.streaming_content
+            async for chunk in content:
+                if chunk.startswith(b'event: ready'):
+                    break
+            await content.aclose()
+        return response
+
+    def run_http(self, plans, processes):
+        from server.asgi import application
+
+        # An explicit protocol, as getaddrinfo would give; asyncio only disables Nagle on sockets that declare TCP
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+        sock.bind((HOST, 0))
+        port = sock.getsockname()[1]
+        server = uvicorn.Server(uvicorn.Config(application, lifespan='off', log_level='warning'))
+        thread = threading.Thread(target=server.run, kwargs={'sockets': [sock]}, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.01)
+
+        results = {}
+        # spawn rather than fork: the parent holds database connections and server threads
+        with multiprocessing.get_context('spawn').Pool(processes) as pool:
+            try:
+                for endpoint, endpoint_plans in sorted(plans.items()):
+                    chunks = [endpoint_plans[index::processes] for index in range(processes)]
+                    started = time.perf_counter()
+                    samples = pool.starmap(replay, [(HOST, port, chunk) for chunk in chunks if chunk])
+                    results[endpoint] = summarize([sample for chunk in samples for sample in chunk], time.perf_counter() - started)
+            finally:
+                server.should_exit = True
+                thread.join()
+        return results
+
+    def report(self, mode, results):
+        self.stdout.write(f'\n{mode}')
+        for endpoint, result in results.items():
+            self.stdout.write(
+                f'  {endpoint:<40} p50={result["p50_ms"]:8.2f}ms p99={result["p99_ms"]:8.2f}ms '
+                f'{result["throughput_rps"]:8.1f} req/s queries={result["queries_per_request"]} errors={result["errors"]}'
+            )
+
+    def compare(self, previous, current):
+        self.stdout.write('\nchanges against the earlier run')
+        for mode in ('client', 'http'):
+            for endpoint, result in current.get(mode, {}).items():
+                before = previous.get(mode, {}).get(endpoint)
+                if before is None:
+                    continue
+                changes = [
+                    f'{key} {before[key]} -> {result[key]}'
+                    for key in ('p50_ms', 'p99_ms', 'queries_per_request')
+                    if before[key] != result[key]
+                ]
+                self.stdout.write(f'  {mode:<6} {endpoint:<40} {", ".join(changes) or "unchanged"}')
@@ -0,0 +1,56 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connections
+
+POLICIES = [
+    ('connection per request', {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False}),
+    ('persistent', {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': False}),
+    ('persistent + health checks', {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True}),
+]
+
+class Command(BaseCommand):
+    help = (
+        'Measure the per-request cost of opening database connections: runs a trivial query between the '
+        'request_started/request_finished signals Django sends, once per connection policy'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        saved = {key: connection.settings_dict[key] for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')}
+        self.stdout.write(f'{connection.vendor} {connection.settings_dict["NAME"]}')
+        try:
+            baseline = None
+            for label, policy in POLICIES:
+                connection.close()
+                connection.settings_dict.update(policy)
+                latencies = self.run(connection, options['requests'])
+                mean = statistics.mean(latencies)
+                baseline = baseline or mean
+                latencies.sort()
+                self.stdout.write(
+                    f'{label:<28} mean={mean * 1000:7.3f}ms p50={statistics.median(latencies) * 1000:7.3f}ms '
+                    f'p99={latencies[int(len(latencies) * 0.99)] * 1000:7.3f}ms saved={(baseline - mean) * 1000:7.3f}ms/request'
+                )
+        finally:
+            connection.close()
+            connection.settings_dict.update(saved)
+
+    def run(self, connection, requests):
+        latencies = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            # The same signals the handlers send, so connections are closed or health checked exactly as in a worker
+            request_started.send(sender=self.__class__)
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            request_finished.send(sender=self.__class__)
+            latencies.append(time.perf_counter() - started)
+        return latencies
@@ -0,0 +1,56 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from social_auth.models import GoogleUser
+from transaction.models import Transaction, TransactionGroup, TransactionRollup
+from transaction.services import compute_rollups, delete_groups, purge_groups
+
+class Command(BaseCommand):
+    help = 'Compare deleting a large group through the collector with soft delete plus chunked purge, using a throwaway test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Transactions in the deleted group')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # pylint: disable=E1101
+            self.owner = GoogleUser.objects.create(first_name='Bench', last_name='Owner', email='bench@example.com', picture='')
+
+            group = self.seed(options['rows'])
+            elapsed, peak = self.measure(group.delete)
+            self.report('collector delete', elapsed, peak)
+
+            group = self.seed(options['rows'])
+            elapsed, peak = self.measure(lambda: delete_groups([group]))
+            self.report('soft delete (hidden)', elapsed, peak)
+            elapsed, peak = self.measure(lambda: purge_groups([group.uuid], chunk_size=options['chunk_size']))
+            self.report(f'chunked purge ({options["chunk_size"]}/chunk)', elapsed, peak)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def seed(self, rows:int) -> TransactionGroup:
+        # pylint: disable=E1101
+        group = TransactionGroup.objects.create(name='Bench', owner=self.owner)
+        Transaction.objects.bulk_create((Transaction(name=f'Row {index}', amount=index % 100 - 50, group=group) for index in range(rows)), batch_size=5000)
+        TransactionRollup.objects.bulk_create(compute_rollups(Transaction.objects.filter(group=group)))
+        return group
+
+    def measure(self, delete):
+        tracemalloc.start()
+        started = time.perf_counter()
+        delete()
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return elapsed, peak
+
+    def report(self, label, elapsed, peak):
+        self.stdout.write(f'{connection.vendor} {label:<28} {elapsed * 1000:9.1f}ms peak={peak / 1024 / 1024:7.1f}MiB')
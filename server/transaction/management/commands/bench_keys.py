@@ -0,0 +1,62 @@
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from server.ids import uuid7
+from social_auth.models import GoogleUser
+from transaction.models import Transaction, TransactionGroup
+
+KEY_FACTORIES = {
+    'uuid4': uuid.uuid4,
+    'uuid7': uuid7,
+}
+
+class Command(BaseCommand):
+    help = 'Compare bulk insert and lookup speed of uuid4 and uuid7 primary keys on a throwaway test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--lookups', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # pylint: disable=E1101
+            owner = GoogleUser.objects.create(first_name='Bench', last_name='User', email='bench@example.com', picture='https://example.com/bench.png')
+            group = TransactionGroup.objects.create(name='Bench', owner=owner)
+            for name, factory in KEY_FACTORIES.items():
+                self.run(name, factory, group, options)
+                Transaction.objects.all().delete()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run(self, name, factory, group, options):
+        rows, batch_size = options['rows'], options['batch_size']
+        keys = []
+
+        started = time.perf_counter()
+        for offset in range(0, rows, batch_size):
+            batch = [Transaction(uuid=factory(), name='Bench', group=group, amount=offset) for _ in range(min(batch_size, rows - offset))]
+            keys.extend(transaction.uuid for transaction in batch)
+            Transaction.objects.bulk_create(batch)
+        insert_elapsed = time.perf_counter() - started
+
+        sample = random.sample(keys, min(options['lookups'], len(keys)))
+        started = time.perf_counter()
+        for key in sample:
+            Transaction.objects.values_list('amount', flat=True).get(uuid=key)
+        lookup_elapsed = time.perf_counter() - started
+
+        line = f'{name}: inserts/s={rows / insert_elapsed:10.0f} lookups/s={len(sample) / lookup_elapsed:8.0f}'
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_indexes_size('transaction_transaction')")
+                line += f' index_bytes={cursor.fetchone()[0]}'
+        self.stdout.write(line)
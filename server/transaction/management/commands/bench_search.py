@@ -0,0 +1,63 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from social_auth.models import GoogleUser
+from transaction.factories import WORDS
+from transaction.models import Transaction, TransactionGroup
+from transaction.search import search_transactions
+
+class Command(BaseCommand):
+    help = 'Time typeahead searches over transaction names as the table grows, using a throwaway test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000', help='Comma separated table sizes to measure at')
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.run(sorted(int(size) for size in options['sizes'].split(',')), options['queries'], options['batch_size'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run(self, sizes, queries, batch_size):
+        rng = random.Random(0)
+        # pylint: disable=E1101
+        owner = GoogleUser.objects.create(first_name='Bench', last_name='Owner', email='bench@example.com', picture='')
+        groups = TransactionGroup.objects.bulk_create([TransactionGroup(name=f'Group {index}', owner=owner) for index in range(10)])
+        owned = Transaction.objects.filter(group__owner=owner)
+
+        seeded = 0
+        for size in sizes:
+            while seeded < size:
+                count = min(batch_size, size - seeded)
+                Transaction.objects.bulk_create([
+                    Transaction(
+                        name=f'{rng.choice(WORDS)} {rng.choice(WORDS)} {seeded + index}',
+                        amount=rng.randint(-5000, 5000), group=rng.choice(groups),
+                    )
+                    for index in range(count)
+                ])
+                seeded += count
+
+            latencies = []
+            for _ in range(queries):
+                word = rng.choice(WORDS)
+                prefix = word[:rng.randint(2, len(word))]
+                started = time.perf_counter()
+                list(search_transactions(owned, prefix)[:20])
+                latencies.append(time.perf_counter() - started)
+
+            latencies.sort()
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            self.stdout.write(
+                f'{connection.vendor} rows={size:<9} p50={statistics.median(latencies) * 1000:7.2f}ms p99={p99 * 1000:7.2f}ms'
+            )
@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from rest_framework.renderers import JSONRenderer
+
+from server.renderers import ORJSONRenderer, orjson
+from social_auth.models import GoogleUser
+from transaction.factories import WORDS
+from transaction.models import Transaction, TransactionGroup
+from transaction.representations import values_representation
+from transaction.serializers import TransactionSerializer
+
+class Command(BaseCommand):
+    help = 'Rows per second through ModelSerializer versus the values() fast path for transaction lists, using a throwaway test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5, help='Best of this many runs is reported')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.run(options['rows'], options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run(self, rows, repeat):
+        # pylint: disable=E1101
+        owner = GoogleUser.objects.create(first_name='Bench', last_name='Owner', email='bench@example.com', picture='')
+        group = TransactionGroup.objects.create(name='Bench', owner=owner)
+        Transaction.objects.bulk_create(
+            (Transaction(name=f'{WORDS[index % len(WORDS)]} {index}', amount=index % 100 - 50, group=group) for index in range(rows)),
+            batch_size=5000,
+        )
+        transactions = Transaction.objects.filter(group=group).order_by('created', 'uuid')
+        representation = values_representation(TransactionSerializer)
+
+        paths = {
+            'ModelSerializer': lambda: TransactionSerializer(list(transactions), many=True).data,
+            'values() fast path': lambda: representation.many(transactions.values(*representation.sources)),
+        }
+        renderers = {'JSONRenderer': JSONRenderer()}
+        if orjson is not None:
+            renderers['ORJSONRenderer'] = ORJSONRenderer()
+
+        expected = None
+        for path, serialize in paths.items():
+            for renderer_name, renderer in renderers.items():
+                best_serialize = best_total = float('inf')
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    data = serialize()
+                    serialized = time.perf_counter()
+                    content = renderer.render(data)
+                    best_serialize = min(best_serialize, serialized - started)
+                    best_total = min(best_total, time.perf_counter() - started)
+
+                if expected is None:
+                    expected = content
+                elif content != expected:
+                    raise CommandError(f'{path} with {renderer_name} does not match the ModelSerializer output')
+                self.stdout.write(
+                    f'{path:<20} {renderer_name:<15} serialize={rows / best_serialize:10,.0f} rows/s '
+                    f'serialize+render={rows / best_total:10,.0f} rows/s'
+                )
+        if orjson is None:
+            self.stdout.write('orjson is not installed; ORJSONRenderer skipped')
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import resource
+import statistics
+import time
+import tracemalloc
+
+import jwt
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from server.asgi import application
+from social_auth.models import GoogleUser
+from transaction.events import get_broker, owner_channel
+
+class Connection:
+    """A fake ASGI client that holds an event stream open until told to disconnect."""
+
+    def __init__(self, token):
+        self.token = token
+        self.ready = asyncio.Event()
+        self.disconnected = asyncio.Event()
+        self.received = {}
+        self.request_sent = False
+        self.status = None
+
+    async def receive(self):
+        if not self.request_sent:
+            self.request_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self.disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+            if self.status != 200:
+                self.ready.set()
+            return
+        body = message.get('body', b'')
+        if b'event: ready' in body:
+            self.ready.set()
+        if b'event: bench' in body:
+            self.received[body] = time.perf_counter()
+
+    def run(self):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': '/transaction/events', 'raw_path': b'/transaction/events', 'root_path': '', 'query_string': b'',
+            'headers': [(b'host', b'127.0.0.1'), (b'authorization', f'Bearer {self.token}'.encode())],
+            'client': ('127.0.0.1', 0), 'server': ('127.0.0.1', 80),
+        }
+        return asyncio.ensure_future(application(scope, self.receive, self.send))
+
+class Command(BaseCommand):
+    help = 'Hold idle Server-Sent Event streams open on one worker and measure their memory and fan-out latency, using a throwaway test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--rounds', type=int, default=20)
+
+    def handle(self, *args, **options):
+        os.environ.setdefault('SECRET_KEY', 'bench-secret')
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # pylint: disable=E1101
+            users = GoogleUser.objects.bulk_create([
+                GoogleUser(first_name='Bench', last_name=str(index), email=f'bench{index}@example.com', picture='')
+                for index in range(options['users'])
+            ])
+            asyncio.run(self.run(users, options['connections'], options['rounds']))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    async def run(self, users, count, rounds):
+        tokens = [jwt.encode({'email': user.email}, os.environ['SECRET_KEY'], algorithm='HS256') for user in users]
+        broker = get_broker()
+
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        started = time.perf_counter()
+        clients = [Connection(tokens[index % len(tokens)]) for index in range(count)]
+        tasks = [client.run() for client in clients]
+        await asyncio.gather(*(client.ready.wait() for client in clients))
+        elapsed = time.perf_counter() - started
+        if any(client.status != 200 for client in clients):
+            raise CommandError(f'Event stream refused: {next(client.status for client in clients if client.status != 200)}')
+
+        per_connection = (tracemalloc.get_traced_memory()[0] - baseline) / count
+        rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+        tracemalloc.stop()
+        self.stdout.write(
+            f'connections={broker.connection_count()} opened in {elapsed:.2f}s '
+            f'python heap/connection={per_connection / 1024:.1f}KiB max RSS growth={rss_growth / 1024:.1f}MiB'
+        )
+
+        latencies = []
+        for round_number in range(rounds):
+            published = time.perf_counter()
+            for user in users:
+                broker.publish(owner_channel(user.uuid), {'type': 'bench', 'round': round_number})
+            while any(len(client.received) <= round_number for client in clients):
+                await asyncio.sleep(0)
+            latencies.append(max(list(client.received.values())[round_number] for client in clients) - published)
+
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f'fan-out to {count} streams: p50={statistics.median(latencies) * 1000:7.1f}ms p99={p99 * 1000:7.1f}ms'
+        )
+
+        for client in clients:
+            client.disconnected.set()
+        await asyncio.gather(*tasks)
+        self.stdout.write(f'connections after disconnect={broker.connection_count()}')
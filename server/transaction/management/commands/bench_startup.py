@@ -0,0 +1,88 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What a worker does before its first request: settings, app registry, URLconf and the middleware chain
+BOOT = '''
+import os
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server.settings')
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+'''
+
+# /metrics is a DRF view that raises 404 without touching the database, so this is middleware, routing and DRF dispatch
+REQUESTS = BOOT + '''
+import json, sys, time
+from django.test import Client
+from django.test.utils import setup_test_environment
+setup_test_environment()
+client = Client()
+count = int(sys.argv[1])
+for _ in range(min(count, 200)):
+    client.get('/metrics')
+best = float('inf')
+for _ in range(5):
+    started = time.perf_counter()
+    for _ in range(count):
+        client.get('/metrics')
+    best = min(best, (time.perf_counter() - started) / count)
+from django.conf import settings
+print(json.dumps({'request_us': best * 1e6, 'middleware': len(settings.MIDDLEWARE), 'apps': len(settings.INSTALLED_APPS)}))
+'''
+
+PROFILES = {'full': '', 'api': 'True'}
+
+class Command(BaseCommand):
+    help = 'Compare worker boot imports (python -X importtime) and per-request overhead of the full and API_ONLY settings profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--boots', type=int, default=5, help='Best of this many cold boots is reported')
+        parser.add_argument('--top', type=int, default=8, help='Heaviest top-level packages to list per profile')
+
+    def handle(self, *args, **options):
+        for profile, api_only in PROFILES.items():
+            env = {**os.environ, 'API_ONLY': api_only}
+            imports = self.import_times(env)
+            boot = min(self.boot_time(env) for _ in range(options['boots']))
+            requests = json.loads(self.run([sys.executable, '-c', REQUESTS, str(options['requests'])], env).stdout)
+
+            heaviest = ', '.join(f'{package} {us / 1000:.1f}ms' for package, us in imports.most_common(options['top']))
+            self.stdout.write(
+                f'{profile:<5} apps={requests["apps"]:<3} middleware={requests["middleware"]:<3} '
+                f'boot={boot * 1000:7.1f}ms imports={sum(imports.values()) / 1000:7.1f}ms modules={len(self.modules):<5} '
+                f'request={requests["request_us"]:7.1f}us'
+            )
+            self.stdout.write(f'      heaviest imports: {heaviest}')
+
+    def run(self, command, env):
+        result = subprocess.run(command, env=env, cwd=settings.BASE_DIR, capture_output=True, text=True, check=False)
+        if result.returncode:
+            raise CommandError(result.stderr)
+        return result
+
+    def boot_time(self, env):
+        started = time.perf_counter()
+        self.run([sys.executable, '-c', BOOT], env)
+        return time.perf_counter() - started
+
+    def import_times(self, env) -> Counter:
+        """Self time per top-level package, from -X importtime's `self [us] | cumulative | package` lines."""
+        stderr = self.run([sys.executable, '-X', 'importtime', '-c', BOOT], env).stderr
+        self.modules = []
+        totals = Counter()
+        for line in stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, _, module = line.removeprefix('import time:').split('|')
+            self.modules.append(module.strip())
+            totals[module.strip().split('.')[0]] += int(self_us)
+        return totals
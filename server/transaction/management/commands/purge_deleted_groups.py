@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from transaction.models import TransactionGroup
+from transaction.services import purge_groups
+
+class Command(BaseCommand):
+    help = 'Remove soft-deleted groups and their rows in chunks; schedule this unless GROUP_PURGE_DEFERRED=False'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, help='Rows deleted per database transaction (default GROUP_PURGE_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        group_ids = list(TransactionGroup.all_objects.filter(deleted=True).order_by('pk').values_list('pk', flat=True))
+
+        deleted = 0
+        for index, group_id in enumerate(group_ids, 1):
+            deleted += purge_groups([group_id], chunk_size=options['chunk_size'])
+            self.stdout.write(f'Purged {index}/{len(group_ids)} groups')
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} row(s)'))
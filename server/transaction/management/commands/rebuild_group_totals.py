@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from transaction.models import Transaction, TransactionGroup, TransactionRollup
+from transaction.services import summarize_groups
+
+class Command(BaseCommand):
+    help = 'Recompute TransactionGroup income, expenses and balance from their transactions and archived months'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Report drifted groups without repairing them')
+
+    def handle(self, *args, **options):
+        # pylint: disable=E1101
+        computed = summarize_groups(Transaction.objects.all(), TransactionRollup.objects.all())
+
+        drifted = []
+        for group in TransactionGroup.objects.only('uuid', 'name', 'income', 'expenses', 'balance').iterator():
+            totals = computed.get(group.uuid, {'income': 0, 'expenses': 0, 'balance': 0})
+            differences = [
+                f'{field} stored={getattr(group, field)} expected={totals[field]}'
+                for field in ('income', 'expenses', 'balance') if getattr(group, field) != totals[field]
+            ]
+            if differences:
+                self.stdout.write(f"{group.uuid} {group.name}: {', '.join(differences)}")
+                drifted.append(group)
+                group.income = totals['income']
+                group.expenses = totals['expenses']
+                group.balance = totals['balance']
+
+        if options['check']:
+            if drifted:
+                raise CommandError(f'{len(drifted)} group(s) have drifted totals')
+            self.stdout.write(self.style.SUCCESS('All group totals are consistent'))
+            return
+
+        TransactionGroup.objects.bulk_update(drifted, ['income', 'expenses', 'balance'], batch_size=500)
+        self.stdout.write(self.style.SUCCESS(f'Repaired {len(drifted)} group(s)'))
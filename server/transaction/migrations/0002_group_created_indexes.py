@@ -0,0 +1,21 @@
+# Generated by Django 4.2.4 on 2026-10-18 08:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['group', 'created'], name='transaction_group_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactiongroup',
+            index=models.Index(fields=['owner', 'created'], name='group_owner_created_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.4 on 2026-10-18 08:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0002_group_created_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('amount__gt', 0)), fields=['group', 'created'], name='transaction_income_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('amount__lt', 0)), fields=['group', 'created'], name='transaction_expense_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['group', 'amount'], name='transaction_group_amount_idx'),
+        ),
+    ]
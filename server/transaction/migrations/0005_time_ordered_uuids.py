@@ -0,0 +1,24 @@
+# Generated by Django 4.2.4 on 2026-10-18 08:32
+
+from django.db import migrations, models
+import server.ids
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0004_transactionrollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='uuid',
+            field=models.UUIDField(default=server.ids.uuid7, editable=False, primary_key=True, serialize=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='transactiongroup',
+            name='uuid',
+            field=models.UUIDField(default=server.ids.uuid7, editable=False, primary_key=True, serialize=False, unique=True),
+        ),
+    ]
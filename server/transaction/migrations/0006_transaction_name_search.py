@@ -0,0 +1,32 @@
+from django.db import migrations
+
+# PostgreSQL only; the SQLite FTS5 fallback is kept up by transaction.search.ensure_sqlite_search_index
+FORWARDS = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    # What SearchVector('name', config='simple') compiles to, so transaction.search can use it
+    "CREATE INDEX IF NOT EXISTS transaction_name_search_idx ON transaction_transaction USING gin (to_tsvector('simple'::regconfig, COALESCE(\"name\", '')))",
+    # Serves the admin's name__icontains search, which compiles to UPPER(name::text) LIKE ...
+    'CREATE INDEX IF NOT EXISTS transaction_name_trgm_idx ON transaction_transaction USING gin (UPPER("name"::text) gin_trgm_ops)',
+]
+
+BACKWARDS = [
+    'DROP INDEX IF EXISTS transaction_name_trgm_idx',
+    'DROP INDEX IF EXISTS transaction_name_search_idx',
+]
+
+def run_postgres(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            for statement in statements:
+                schema_editor.execute(statement)
+    return run
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0005_time_ordered_uuids'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_postgres(FORWARDS), run_postgres(BACKWARDS)),
+    ]
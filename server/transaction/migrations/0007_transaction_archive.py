@@ -0,0 +1,33 @@
+# Generated by Django 4.2.4 on 2026-10-18 08:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0006_transaction_name_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transactionrollup',
+            name='frozen',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='ArchivedTransaction',
+            fields=[
+                ('uuid', models.UUIDField(editable=False, primary_key=True, serialize=False, unique=True)),
+                ('name', models.CharField(max_length=200)),
+                ('amount', models.IntegerField(default=0)),
+                ('created', models.DateTimeField()),
+                ('archived', models.DateTimeField(auto_now_add=True)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='transaction.transactiongroup')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['group', 'created'], name='archived_group_created_idx')],
+            },
+        ),
+    ]
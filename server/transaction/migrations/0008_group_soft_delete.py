@@ -0,0 +1,18 @@
+# Generated by Django 4.2.4 on 2026-10-18 08:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0007_transaction_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transactiongroup',
+            name='deleted',
+            field=models.BooleanField(default=False),
+        ),
+    ]
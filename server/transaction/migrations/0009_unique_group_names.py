@@ -0,0 +1,39 @@
+# Generated by Django 4.2.4 on 2026-10-18 09:02
+
+from django.db import migrations, models
+from django.db.models import Count
+
+def rename_duplicate_groups(apps, schema_editor):
+    # Keep the oldest group's name and number the rest, "Food (2)", "Food (3)", ... so no transactions move
+    TransactionGroup = apps.get_model('transaction', 'TransactionGroup')
+    live = TransactionGroup.objects.filter(deleted=False)
+    duplicated = live.values('owner', 'name').annotate(count=Count('uuid')).filter(count__gt=1).order_by()
+
+    for row in duplicated:
+        taken = set(live.filter(owner=row['owner']).values_list('name', flat=True))
+        groups = list(live.filter(owner=row['owner'], name=row['name']).order_by('created', 'uuid'))
+        number = 1
+        for group in groups[1:]:
+            while True:
+                number += 1
+                suffix = f' ({number})'
+                name = group.name[:200 - len(suffix)] + suffix
+                if name not in taken:
+                    break
+            taken.add(name)
+            group.name = name
+            group.save(update_fields=['name'])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0008_group_soft_delete'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_groups, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='transactiongroup',
+            constraint=models.UniqueConstraint(condition=models.Q(('deleted', False)), fields=('owner', 'name'), name='group_owner_name_uniq'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.4 on 2026-10-18 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import transaction.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0009_unique_group_names'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionSearchDocument',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('name', models.TextField()),
+            ],
+            options={
+                'db_table': 'transaction_transaction_search',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='TransactionSearchIndex',
+            fields=[
+                ('document', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='index', serialize=False, to='transaction.transactionsearchdocument')),
+                ('name', transaction.models.SearchIndexField()),
+            ],
+            options={
+                'db_table': 'transaction_transaction_search_fts',
+                'managed': False,
+            },
+        ),
+    ]
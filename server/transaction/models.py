@@ -1,34 +1,123 @@
 from django.db import models
-import uuid
-from json import JSONEncoder
+from server.ids import uuid7
 from social_auth.models import GoogleUser
 
-# UUID not serializable fix
-JSONEncoder_olddefault = JSONEncoder.default
-def JSONEncoder_newdefault(self, o):
-    if isinstance(o, uuid.UUID): return str(o)
-    return JSONEncoder_olddefault(self, o)
-JSONEncoder.default = JSONEncoder_newdefault
+class ActiveGroupManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted=False)
 
 class TransactionGroup(models.Model):
-    uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True, primary_key=True)
+    uuid = models.UUIDField(default=uuid7, editable=False, unique=True, primary_key=True)
     name = models.CharField(max_length=200)
     owner = models.ForeignKey(GoogleUser, on_delete=models.CASCADE)
     balance = models.IntegerField(default=0)
     expenses = models.IntegerField(default=0)
     income = models.IntegerField(default=0)
     created= models.DateTimeField(auto_now_add=True)
+    # Deleted groups are hidden at once and their rows purged in chunks afterwards
+    deleted = models.BooleanField(default=False)
+
+    objects = ActiveGroupManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'created'], name='group_owner_created_idx'),
+        ]
+        constraints = [
+            # Deleted groups waiting to be purged give their name up straight away
+            models.UniqueConstraint(fields=['owner', 'name'], condition=models.Q(deleted=False), name='group_owner_name_uniq'),
+        ]
 
     def __str__(self):
         return str(self.name)
 
 class Transaction(models.Model):
-    uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True, primary_key=True)
+    uuid = models.UUIDField(default=uuid7, editable=False, unique=True, primary_key=True)
     name = models.CharField(max_length=200)
     group = models.ForeignKey(TransactionGroup, on_delete=models.CASCADE)
     amount = models.IntegerField(default=0)
     created= models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['group', 'created'], name='transaction_group_created_idx'),
+            models.Index(fields=['group', 'created'], condition=models.Q(amount__gt=0), name='transaction_income_idx'),
+            models.Index(fields=['group', 'created'], condition=models.Q(amount__lt=0), name='transaction_expense_idx'),
+            models.Index(fields=['group', 'amount'], name='transaction_group_amount_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.name)
+
+class TransactionRollup(models.Model):
+    DAY = 'day'
+    MONTH = 'month'
+    PERIODS = [(DAY, 'Day'), (MONTH, 'Month')]
+
+    group = models.ForeignKey(TransactionGroup, on_delete=models.CASCADE)
+    period = models.CharField(max_length=5, choices=PERIODS)
+    start = models.DateField()
+    balance = models.IntegerField(default=0)
+    expenses = models.IntegerField(default=0)
+    income = models.IntegerField(default=0)
+    # Set once the period's transactions have moved to ArchivedTransaction; the row is then the only live copy of its totals
+    frozen = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['group', 'period', 'start'], name='rollup_group_period_start_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.group_id} {self.period} {self.start}'
+
+class ArchivedTransaction(models.Model):
+    uuid = models.UUIDField(editable=False, unique=True, primary_key=True)
+    name = models.CharField(max_length=200)
+    group = models.ForeignKey(TransactionGroup, on_delete=models.CASCADE)
+    amount = models.IntegerField(default=0)
+    # Copied from the original row, so not auto_now_add
+    created = models.DateTimeField()
+    archived = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['group', 'created'], name='archived_group_created_idx'),
+        ]
+
     def __str__(self):
         return str(self.name)
 
+class SearchMatch(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+class SearchIndexField(models.TextField):
+    """A column of an SQLite FTS5 table, filtered with __match."""
+
+SearchIndexField.register_lookup(SearchMatch)
+
+# The SQLite search fallback's tables, created by transaction.search.ensure_sqlite_search_index rather than migrations
+
+class TransactionSearchDocument(models.Model):
+    # An INTEGER PRIMARY KEY, which VACUUM never renumbers, for FTS5 to index by
+    id = models.IntegerField(primary_key=True)
+    transaction = models.OneToOneField(Transaction, db_column='uuid', related_name='search_document', on_delete=models.DO_NOTHING, db_constraint=False)
+    name = models.TextField()
+
+    class Meta:
+        managed = False
+        db_table = 'transaction_transaction_search'
+
+class TransactionSearchIndex(models.Model):
+    document = models.OneToOneField(TransactionSearchDocument, primary_key=True, db_column='rowid', related_name='index', on_delete=models.DO_NOTHING, db_constraint=False)
+    name = SearchIndexField()
+
+    class Meta:
+        managed = False
+        db_table = 'transaction_transaction_search_fts'
@@ -0,0 +1,73 @@
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+def identity(value):
+    return value
+
+def to_string(value):
+    # UUIDs, and related primary keys the JSON encoder would otherwise stringify
+    return None if value is None else str(value)
+
+def to_datetime() -> Callable:
+    # DateTimeField.to_representation in ISO 8601, bound to the timezone active for this response
+    field_timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+
+    def convert(value):
+        if not value:
+            return None
+        if field_timezone is not None and timezone.is_aware(value):
+            value = value.astimezone(field_timezone)
+        value = value.isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+def converter_factory(field:serializers.Field) -> Callable[[], Callable]:
+    """What `field.to_representation` does for a raw column value, as a factory bound once per response."""
+    if isinstance(field, (serializers.CharField, serializers.IntegerField, serializers.BooleanField)):
+        return lambda: identity
+    if isinstance(field, serializers.UUIDField) and field.uuid_format == 'hex_verbose':
+        return lambda: to_string
+    if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+        return lambda: to_string
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if isinstance(field, serializers.DateTimeField) and output_format == ISO_8601 and not hasattr(field, 'timezone'):
+        return to_datetime
+    raise ImproperlyConfigured(f'{field.__class__.__name__} {field.field_name!r} has no values() fast path')
+
+class ValuesRepresentation:
+    """Builds what `serializer_class(many=True).data` renders to, straight from `values()` rows."""
+
+    def __init__(self, serializer_class:type):
+        fields = serializer_class().fields
+        self.fields: List[Tuple[str, str, Callable]] = [
+            (name, field.source, converter_factory(field)) for name, field in fields.items() if not field.write_only
+        ]
+        self.sources = [source for _, source, _ in self.fields]
+
+    def many(self, rows:Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        fields = [(name, source, factory()) for name, source, factory in self.fields]
+        return [{name: convert(row[source]) for name, source, convert in fields} for row in rows]
+
+@lru_cache(maxsize=None)
+def values_representation(serializer_class:type) -> ValuesRepresentation:
+    return ValuesRepresentation(serializer_class)
+
+class ValuesListMixin:
+    """Read-only list views that skip model instances and field-by-field serialization."""
+
+    def list(self, request, *args, **kwargs):
+        representation = values_representation(self.get_serializer_class())
+        queryset = self.filter_queryset(self.get_queryset()).values(*representation.sources)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(representation.many(page))
+        return Response(representation.many(queryset))
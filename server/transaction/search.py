@@ -0,0 +1,169 @@
+import re
+from collections.abc import Sequence
+from typing import Any, List, Tuple
+
+from django.db import connections
+from django.db.models import QuerySet
+
+from .models import Transaction, TransactionSearchDocument, TransactionSearchIndex
+
+SEARCH_CONFIG = 'simple'
+# SQLite: the names are copied into a content table keyed by an INTEGER PRIMARY KEY, which VACUUM never renumbers
+# (Transaction's own rowid is implicit, as its primary key is a UUID), and FTS5 indexes that table
+SQLITE_SEARCH_DOCUMENTS = TransactionSearchDocument._meta.db_table
+SQLITE_SEARCH_TABLE = TransactionSearchIndex._meta.db_table
+SQLITE_LEGACY_SEARCH_TABLE = 'transaction_transaction_fts'
+# FTS5 answers a prefix query from a prefix index in rowid order, so it can stop after the newest matches;
+# any other prefix length makes it merge the doclist of every matching word first
+SQLITE_PREFIX_LENGTHS = range(2, 9)
+MAX_SEARCH_TERMS = 8
+# Single letters match whole words only: as prefixes they would match a large share of the rows
+MIN_PREFIX_LENGTH = 2
+# Only the newest matches are ranked, so a short prefix costs the same however many rows it matches
+MAX_SEARCH_CANDIDATES = 500
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Letters and digits, as FTS5's unicode61 tokenizer splits words
+WORD = re.compile(r'[^\W_]+')
+
+def search_terms(query:str) -> List[str]:
+    # Letters and digits only, so terms can be embedded in tsquery/FTS5 syntax without escaping
+    return WORD.findall(query.lower())[:MAX_SEARCH_TERMS]
+
+def term_matches(term:str, word:str) -> bool:
+    return word.startswith(term) if len(term) >= MIN_PREFIX_LENGTH else word == term
+
+def sqlite_match(term:str) -> str:
+    if len(term) < MIN_PREFIX_LENGTH:
+        return f'"{term}"'
+    # Longer terms use the longest prefix index; rank_candidates then puts the full prefix matches first
+    return f'"{term[:SQLITE_PREFIX_LENGTHS[-1]]}"*'
+
+def search_candidates(transactions:QuerySet, terms:List[str]) -> QuerySet:
+    """Every match of `terms`, newest first, in an order the index can produce without sorting the matches."""
+    vendor = connections[transactions.db].vendor
+    if vendor == 'postgresql':
+        # Imported here so SQLite-only installs do not need psycopg2
+        from django.contrib.postgres.search import SearchQuery, SearchVector
+
+        # Must compile to the expression indexed by migration 0006; UUIDv7 keys sort by creation time
+        vector = SearchVector('name', config=SEARCH_CONFIG)
+        tsquery = ' & '.join(f'{term}:*' if len(term) >= MIN_PREFIX_LENGTH else term for term in terms)
+        search_query = SearchQuery(tsquery, config=SEARCH_CONFIG, search_type='raw')
+        return transactions.annotate(search=vector).filter(search=search_query).order_by('-pk')
+    if vendor == 'sqlite':
+        # FTS5 drives the join and walks its rowids, which follow insertion order, backwards
+        match = ' '.join(sqlite_match(term) for term in terms)
+        return transactions.filter(search_document__index__name__match=match).order_by('-search_document__index__pk')
+    for term in terms:
+        transactions = transactions.filter(name__icontains=term)
+    return transactions.order_by('-pk')
+
+def rank_candidates(candidates:List[Tuple[Any, str]], terms:List[str]) -> List[Any]:
+    """Order (pk, name) pairs by BM25 over the candidates, keeping newest first among equal scores.
+
+    Every candidate matches every term, so idf is the same for all of them and left out. bm25() itself would
+    count each term's matches across the whole table for it.
+    """
+    if not candidates:
+        return []
+    words = [WORD.findall(name.lower()) for _, name in candidates]
+    average_length = sum(map(len, words)) / len(words) or 1
+
+    def score(name_words):
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * len(name_words) / average_length)
+        total = 0.0
+        for term in terms:
+            frequency = sum(1 for word in name_words if term_matches(term, word))
+            total += frequency * (BM25_K1 + 1) / (frequency + norm)
+        return total
+
+    scores = [score(name_words) for name_words in words]
+    # sorted() is stable, so equal scores keep the candidates' newest-first order
+    order = sorted(range(len(candidates)), key=lambda index: -scores[index])
+    return [candidates[index][0] for index in order]
+
+class RankedMatches(Sequence):
+    """Ranked search results that load only the rows of the slice asked for."""
+
+    def __init__(self, transactions:QuerySet, pks:List[Any]):
+        self.transactions = transactions
+        self.pks = pks
+
+    def __len__(self):
+        return len(self.pks)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1 or None][0]
+        pks = self.pks[index]
+        rows = self.transactions.in_bulk(pks)
+        return [rows[pk] for pk in pks if pk in rows]
+
+def search_transactions(transactions:QuerySet, query:str) -> RankedMatches:
+    """Names matching every term as a word prefix, best first, out of the newest MAX_SEARCH_CANDIDATES matches."""
+    terms = search_terms(query)
+    if not terms:
+        return RankedMatches(transactions.none(), [])
+    candidates = list(search_candidates(transactions, terms).values_list('pk', 'name')[:MAX_SEARCH_CANDIDATES])
+    # The candidates already passed the caller's filters; fetching pages by primary key alone keeps planners on it
+    # pylint: disable=E1101
+    return RankedMatches(Transaction.objects.using(transactions.db), rank_candidates(candidates, terms))
+
+def ensure_sqlite_search_index(using:str) -> None:
+    # SQLite rebuilds tables on most ALTERs and drops their triggers, so this runs after every migrate rather than once
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+
+    table = Transaction._meta.db_table
+    documents, fts = SQLITE_SEARCH_DOCUMENTS, SQLITE_SEARCH_TABLE
+    with connection.cursor() as cursor:
+        # The first version indexed Transaction's implicit rowid directly
+        for trigger in ('insert', 'delete', 'update'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {SQLITE_LEGACY_SEARCH_TABLE}_{trigger}')
+        cursor.execute(f'DROP TABLE IF EXISTS {SQLITE_LEGACY_SEARCH_TABLE}')
+
+        cursor.execute(f'CREATE TABLE IF NOT EXISTS {documents} (id INTEGER PRIMARY KEY, uuid char(32) NOT NULL UNIQUE, name TEXT NOT NULL)')
+        # Tables from before the prefix indexes are recreated; the rebuild below fills them in
+        prefix = ' '.join(map(str, SQLITE_PREFIX_LENGTHS))
+        cursor.execute("SELECT sql FROM sqlite_master WHERE name = %s", [fts])
+        existing = cursor.fetchone()
+        if existing and f"prefix='{prefix}'" not in existing[0]:
+            cursor.execute(f'DROP TABLE {fts}')
+        cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(name, content='{documents}', content_rowid='id', prefix='{prefix}')")
+        # Transaction rows feed the content table...
+        cursor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {documents}_insert AFTER INSERT ON {table} BEGIN '
+            f'INSERT INTO {documents}(uuid, name) VALUES (new.uuid, new.name); END'
+        )
+        cursor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {documents}_delete AFTER DELETE ON {table} BEGIN '
+            f'DELETE FROM {documents} WHERE uuid = old.uuid; END'
+        )
+        cursor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {documents}_update AFTER UPDATE OF name ON {table} BEGIN '
+            f'UPDATE {documents} SET name = new.name WHERE uuid = new.uuid; END'
+        )
+        # ...and the content table feeds FTS5
+        cursor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {documents} BEGIN '
+            f'INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name); END'
+        )
+        cursor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {documents} BEGIN '
+            f"INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', old.id, old.name); END"
+        )
+        cursor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF name ON {documents} BEGIN '
+            f"INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', old.id, old.name); "
+            f'INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name); END'
+        )
+
+        # Catch up on writes made while a table rebuild had dropped the triggers, then reindex
+        cursor.execute(f'DELETE FROM {documents} WHERE uuid NOT IN (SELECT uuid FROM {table})')
+        cursor.execute(
+            f'INSERT INTO {documents}(uuid, name) SELECT uuid, name FROM {table} WHERE true '
+            f'ON CONFLICT(uuid) DO UPDATE SET name = excluded.name WHERE name != excluded.name'
+        )
+        cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
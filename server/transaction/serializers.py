@@ -1,12 +1,85 @@
 from rest_framework import serializers
-from .models import TransactionGroup,Transaction
+from rest_framework.validators import UniqueTogetherValidator
+from .models import TransactionGroup,Transaction,TransactionRollup,ArchivedTransaction
+
+MAX_BATCH_OPERATIONS = 500
+GROUP_NAME_TAKEN = 'A group with this name already exists.'
 
 class TransactionGroupSerializer(serializers.ModelSerializer):
     class Meta:
         model = TransactionGroup
         fields = ['uuid', 'name', 'owner', 'balance','expenses','income','created']
+        read_only_fields = ['balance','expenses','income']
+        # DRF 3.14 only derives validators from unique_together, not UniqueConstraint
+        validators = [
+            UniqueTogetherValidator(queryset=TransactionGroup.objects.all(), fields=['owner', 'name'], message=GROUP_NAME_TAKEN),
+        ]
 
 class TransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Transaction
         fields = ['uuid','name','group','amount','created']
+
+class ArchivedTransactionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ArchivedTransaction
+        fields = ['uuid','name','group','amount','created','archived']
+        read_only_fields = fields
+
+class DashboardGroupSerializer(TransactionGroupSerializer):
+    recent_income = TransactionSerializer(many=True, read_only=True)
+    recent_expenses = TransactionSerializer(many=True, read_only=True)
+
+    class Meta(TransactionGroupSerializer.Meta):
+        fields = TransactionGroupSerializer.Meta.fields + ['recent_income','recent_expenses']
+
+class DashboardInputSerializer(serializers.Serializer):
+    recent = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+class TransactionFilterSerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=['income','expense'], required=False)
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    min_amount = serializers.IntegerField(required=False)
+    max_amount = serializers.IntegerField(required=False)
+
+class TransactionSearchSerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=200)
+    group = serializers.UUIDField(required=False)
+
+class GroupLookupSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=200)
+
+class TransactionImportSerializer(serializers.Serializer):
+    group = serializers.UUIDField()
+    name = serializers.CharField(max_length=200)
+    amount = serializers.IntegerField()
+
+class TransactionImportInputSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=['csv','ndjson'], required=False)
+
+    def validate(self, attrs):
+        if 'format' not in attrs:
+            is_ndjson = attrs['file'].name.lower().endswith(('.ndjson', '.jsonl'))
+            attrs['format'] = 'ndjson' if is_ndjson else 'csv'
+        return attrs
+
+class RollupFilterSerializer(serializers.Serializer):
+    period = serializers.ChoiceField(choices=TransactionRollup.PERIODS, default=TransactionRollup.DAY)
+    group = serializers.UUIDField(required=False)
+    since = serializers.DateField(required=False)
+    until = serializers.DateField(required=False)
+
+class BatchOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=['create','update','delete'])
+    uuid = serializers.UUIDField(required=False)
+    data = serializers.DictField(required=False)
+
+    def validate(self, attrs):
+        if attrs['op'] != 'create' and 'uuid' not in attrs:
+            raise serializers.ValidationError({'uuid': ['This field is required.']})
+        return attrs
+
+class BatchInputSerializer(serializers.Serializer):
+    operations = BatchOperationSerializer(many=True, allow_empty=False, max_length=MAX_BATCH_OPERATIONS)
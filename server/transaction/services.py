@@ -0,0 +1,233 @@
+from collections import defaultdict
+from datetime import date, datetime, time
+from typing import Any, Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from django.db.models import F, Min, Q, QuerySet, Sum
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth
+from django.db.transaction import atomic
+from django.utils import timezone
+
+from .caching import group_owners, invalidate_groups, transaction_scope
+from .events import BulkTransactionChanges, publish_group_changes, publish_transaction_changes
+from .models import ArchivedTransaction, Transaction, TransactionGroup, TransactionRollup
+
+TOTAL_FIELDS = ('income', 'expenses', 'balance')
+ARCHIVE_FIELDS = ('uuid', 'name', 'group_id', 'amount', 'created')
+ARCHIVE_CHUNK_SIZE = 1000
+
+def summary_annotations() -> Dict[str, Coalesce]:
+    return {
+        'income': Coalesce(Sum('amount', filter=Q(amount__gt=0)), 0),
+        'expenses': Coalesce(Sum('amount', filter=Q(amount__lt=0)), 0),
+        'balance': Coalesce(Sum('amount'), 0),
+    }
+
+def summarize_transactions(transactions:QuerySet) -> Dict[str, int]:
+    return transactions.aggregate(**summary_annotations())
+
+def frozen_summaries(rollups:QuerySet) -> QuerySet:
+    # Archived months are only kept as their frozen monthly rollups
+    return (
+        rollups.filter(period=TransactionRollup.MONTH, frozen=True)
+        .values('group').annotate(income=Sum('income'), expenses=Sum('expenses'), balance=Sum('balance')).order_by()
+    )
+
+def summarize_groups(transactions:QuerySet, rollups:QuerySet=None) -> Dict[Any, Dict[str, int]]:
+    """Per group totals of `transactions`, plus the frozen summaries in `rollups` when given, in one query."""
+    rows = transactions.values('group').annotate(**summary_annotations()).order_by()
+    if rollups is not None:
+        rows = rows.union(frozen_summaries(rollups), all=True)
+
+    summaries = {}
+    for row in rows:
+        group = row.pop('group')
+        if group in summaries:
+            summaries[group] = {field: summaries[group][field] + row[field] for field in TOTAL_FIELDS}
+        else:
+            summaries[group] = row
+    return summaries
+
+def summarize_owner(owner) -> Dict[str, int]:
+    summary = dict.fromkeys(TOTAL_FIELDS, 0)
+    for totals in summarize_owner_groups(owner).values():
+        for field in TOTAL_FIELDS:
+            summary[field] += totals[field]
+    return summary
+
+def summarize_owner_groups(owner) -> Dict[Any, Dict[str, int]]:
+    # pylint: disable=E1101
+    return summarize_groups(
+        Transaction.objects.filter(group__owner=owner, group__deleted=False),
+        TransactionRollup.objects.filter(group__owner=owner, group__deleted=False),
+    )
+
+def amount_totals(amount:int) -> List[int]:
+    income = amount if amount > 0 else 0
+    expenses = amount if amount < 0 else 0
+    return [income, expenses, amount]
+
+def group_deltas(*, added:Iterable[Transaction]=(), removed:Iterable[Transaction]=()) -> Dict[Any, List[int]]:
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for sign, transactions in ((1, added), (-1, removed)):
+        for transaction in transactions:
+            bucket = deltas[transaction.group_id]
+            for index, value in enumerate(amount_totals(transaction.amount)):
+                bucket[index] += sign * value
+    return deltas
+
+def apply_group_deltas(deltas:Dict[Any, List[int]]) -> None:
+    for group_id, totals in deltas.items():
+        changes = {field: F(field) + value for field, value in zip(TOTAL_FIELDS, totals) if value}
+        if changes:
+            # pylint: disable=E1101
+            TransactionGroup.objects.filter(uuid=group_id).update(**changes)
+
+RollupKey = Tuple[Any, str, date]
+
+def period_starts(created) -> Dict[str, date]:
+    day = timezone.localtime(created).date()
+    return {TransactionRollup.DAY: day, TransactionRollup.MONTH: day.replace(day=1)}
+
+def rollup_deltas(*, added:Iterable[Transaction]=(), removed:Iterable[Transaction]=()) -> Dict[RollupKey, List[int]]:
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for sign, transactions in ((1, added), (-1, removed)):
+        for transaction in transactions:
+            totals = amount_totals(transaction.amount)
+            for period, start in period_starts(transaction.created).items():
+                bucket = deltas[(transaction.group_id, period, start)]
+                for index, value in enumerate(totals):
+                    bucket[index] += sign * value
+    return deltas
+
+def apply_rollup_deltas(deltas:Dict[RollupKey, List[int]]) -> None:
+    deltas = {key: totals for key, totals in deltas.items() if any(totals)}
+    if not deltas:
+        return
+
+    # Make sure every bucket exists, then lock and bump them: three queries however many buckets change
+    # pylint: disable=E1101
+    TransactionRollup.objects.bulk_create(
+        [TransactionRollup(group_id=group_id, period=period, start=start) for group_id, period, start in deltas],
+        ignore_conflicts=True,
+    )
+    rollups = TransactionRollup.objects.select_for_update().filter(
+        group_id__in={key[0] for key in deltas},
+        period__in={key[1] for key in deltas},
+        start__in={key[2] for key in deltas},
+    ).order_by('pk')
+
+    changed = []
+    for rollup in rollups:
+        totals = deltas.get((rollup.group_id, rollup.period, rollup.start))
+        # Archived periods have no live transactions left to change them
+        if totals is None or rollup.frozen:
+            continue
+        rollup.income += totals[0]
+        rollup.expenses += totals[1]
+        rollup.balance += totals[2]
+        changed.append(rollup)
+    TransactionRollup.objects.bulk_update(changed, ['income', 'expenses', 'balance'])
+
+def compute_rollups(transactions:QuerySet) -> List[TransactionRollup]:
+    truncations = {
+        TransactionRollup.DAY: TruncDate('created'),
+        TransactionRollup.MONTH: TruncDate(TruncMonth('created')),
+    }
+    rollups = []
+    for period, trunc in truncations.items():
+        rows = transactions.annotate(start=trunc).values('group', 'start').annotate(**summary_annotations()).order_by()
+        for row in rows:
+            rollups.append(TransactionRollup(group_id=row.pop('group'), period=period, **row))
+    return rollups
+
+def archive_transactions(group_ids:Iterable, before:datetime) -> int:
+    """Move the groups' transactions created before `before` to the archive and freeze their rollups.
+
+    `before` should be the local start of a month so frozen months are never shared with live rows.
+    Group totals are left alone: they already count the archived rows. Run inside a database transaction.
+    """
+    group_ids = list(group_ids)
+    # pylint: disable=E1101
+    old = Transaction.objects.filter(group_id__in=group_ids, created__lt=before)
+    first = old.aggregate(first=Min('created'))['first']
+    if first is None:
+        return 0
+
+    # Rows move a pk-ordered slice at a time, so memory stays flat however long a group's history is
+    archived = 0
+    while rows := list(old.select_for_update().order_by('pk').values_list(*ARCHIVE_FIELDS)[:ARCHIVE_CHUNK_SIZE]):
+        ArchivedTransaction.objects.bulk_create([ArchivedTransaction(**dict(zip(ARCHIVE_FIELDS, row))) for row in rows])
+        Transaction.objects.filter(pk__in=[row[0] for row in rows]).delete()
+        archived += len(rows)
+
+    # Recompute from the archived rows rather than trust the running rollups, so the frozen copy matches them exactly
+    since = timezone.localtime(first).date().replace(day=1)
+    TransactionRollup.objects.filter(group_id__in=group_ids, start__gte=since, start__lt=timezone.localdate(before)).delete()
+    rollups = compute_rollups(ArchivedTransaction.objects.filter(
+        group_id__in=group_ids, created__gte=timezone.make_aware(datetime.combine(since, time())), created__lt=before,
+    ))
+    for rollup in rollups:
+        rollup.frozen = True
+    TransactionRollup.objects.bulk_create(rollups, batch_size=1000)
+
+    # Detail responses depend on their group's scope too, so bumping the groups covers every archived row
+    invalidate_groups(group_ids)
+    return archived
+
+@atomic
+def delete_groups(groups:List[TransactionGroup]) -> None:
+    """Hide `groups` straight away; their rows stay until `purge_groups` runs."""
+    group_ids = [group.uuid for group in groups]
+    # Owners are looked up before the groups disappear from the default manager
+    invalidate_groups(group_ids)
+    publish_group_changes(deleted=groups)
+    # pylint: disable=E1101
+    TransactionGroup.objects.filter(uuid__in=group_ids).update(deleted=True)
+
+def purge_groups(group_ids:Iterable, chunk_size:int=None) -> int:
+    """Delete soft-deleted groups a chunk of rows at a time, each chunk in its own database transaction.
+
+    Deleting the group in one statement would hold a single transaction, and its locks, across years of rows.
+    """
+    chunk_size = chunk_size or settings.GROUP_PURGE_CHUNK_SIZE
+    deleted = 0
+    for group_id in group_ids:
+        # pylint: disable=E1101
+        for model in (Transaction, ArchivedTransaction, TransactionRollup):
+            while True:
+                with atomic():
+                    # Nothing references these rows, so each chunk is one DELETE ... WHERE pk IN (SELECT ... LIMIT n)
+                    count = model.objects.filter(pk__in=model.objects.filter(group_id=group_id).values('pk')[:chunk_size]).delete()[0]
+                deleted += count
+                if count < chunk_size:
+                    break
+        TransactionGroup.all_objects.filter(uuid=group_id, deleted=True).delete()
+    return deleted
+
+def rollup_series(*, groups:QuerySet, period:str, since:date=None, until:date=None) -> List[Dict[str, Any]]:
+    # pylint: disable=E1101
+    rollups = TransactionRollup.objects.filter(group__in=groups, period=period)
+    if since:
+        rollups = rollups.filter(start__gte=since)
+    if until:
+        rollups = rollups.filter(start__lt=until)
+    return list(
+        rollups.values('start')
+        .annotate(income=Sum('income'), expenses=Sum('expenses'), balance=Sum('balance'))
+        .order_by('start')
+    )
+
+def record_transaction_changes(*, added:Iterable[Transaction]=(), removed:Iterable[Transaction]=(), bulk:BulkTransactionChanges=None) -> None:
+    """Apply a write to totals, rollups and caches; `bulk` collects the change for one event instead of publishing the rows."""
+    added, removed = list(added), list(removed)
+    deltas = group_deltas(added=added, removed=removed)
+    apply_group_deltas(deltas)
+    apply_rollup_deltas(rollup_deltas(added=added, removed=removed))
+
+    owners = group_owners(deltas)
+    invalidate_groups(deltas, extra_scopes=[transaction_scope(transaction.uuid) for transaction in removed], owners=owners)
+    if bulk is None:
+        publish_transaction_changes(owners=owners, added=added, removed=removed, deltas=deltas)
+    else:
+        bulk.add(owners=owners, added=added, removed=removed, deltas=deltas)
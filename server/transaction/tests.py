@@ -1,3 +1,916 @@
-from django.test import TestCase
+import json
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Sum
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from .caching import cache_stats, check_replica_cache
+from .events import event_stream, get_broker, owner_channel
+from .factories import seed_users, user_token
+from .models import ArchivedTransaction, Transaction, TransactionGroup, TransactionRollup
+from .search import MAX_SEARCH_CANDIDATES, search_candidates
+from .serializers import TransactionGroupSerializer, TransactionSerializer
+from .services import summarize_owner, summarize_owner_groups
+from .views import TransactionDetail
+from server.performance import PerformanceMiddleware
+from server.renderers import ORJSONRenderer
+from social_auth.models import GoogleUser
+
+class TransactionTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        # pylint: disable=E1101
+        self.user = GoogleUser.objects.create(first_name='Ada', last_name='Lovelace', email='ada@example.com', picture='https://example.com/ada.png')
+        self.group = TransactionGroup.objects.create(name='Wallet', owner=self.user)
+
+    def create_transaction(self, amount, name='Item', group=None):
+        group = group or self.group
+        response = self.client.post('/transaction/create-transaction', {'name': name, 'group': str(group.uuid), 'amount': amount}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+class GroupTotalsTests(TransactionTestCase):
+    def assertTotals(self, group, income, expenses, balance):
+        group.refresh_from_db()
+        self.assertEqual((group.income, group.expenses, group.balance), (income, expenses, balance))
+
+    def test_totals_follow_create_update_delete(self):
+        salary = self.create_transaction(500)
+        self.create_transaction(-200)
+        self.assertTotals(self.group, 500, -200, 300)
+
+        self.client.patch(f"/transaction/{salary['uuid']}", {'amount': -50}, format='json')
+        self.assertTotals(self.group, 0, -250, -250)
+
+        self.client.delete(f"/transaction/{salary['uuid']}")
+        self.assertTotals(self.group, 0, -200, -200)
+
+    def test_delete_removes_the_stored_row_not_a_stale_read(self):
+        salary = self.create_transaction(500)
+        # pylint: disable=E1101
+        stale = Transaction.objects.get(uuid=salary['uuid'])
+        self.client.patch(f"/transaction/{salary['uuid']}", {'amount': -50}, format='json')
+
+        # The edit commits between the delete's get_object() and its write
+        with mock.patch.object(TransactionDetail, 'get_object', return_value=stale):
+            response = self.client.delete(f"/transaction/{salary['uuid']}")
+
+        self.assertEqual(response.status_code, 204)
+        self.assertTotals(self.group, 0, 0, 0)
+
+    def test_moving_transaction_between_groups(self):
+        # pylint: disable=E1101
+        other = TransactionGroup.objects.create(name='Savings', owner=self.user)
+        salary = self.create_transaction(500)
+
+        self.client.patch(f"/transaction/{salary['uuid']}", {'group': str(other.uuid)}, format='json')
+
+        self.assertTotals(self.group, 0, 0, 0)
+        self.assertTotals(other, 500, 0, 500)
+
+    def test_list_groups_is_a_single_read(self):
+        self.create_transaction(500)
+        # pylint: disable=E1101
+        TransactionGroup.objects.create(name='Savings', owner=self.user)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/transaction/list/group/{self.user.uuid}')
+
+        self.assertEqual([group['balance'] for group in response.data], [500, 0])
+
+    def test_rebuild_reports_stored_and_expected_totals(self):
+        self.create_transaction(500)
+        self.create_transaction(-200)
+        # pylint: disable=E1101
+        TransactionGroup.objects.filter(uuid=self.group.uuid).update(income=450, balance=250)
+
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_group_totals', '--check', stdout=out)
+        self.assertIn(f'{self.group.uuid} Wallet: income stored=450 expected=500, balance stored=250 expected=300', out.getvalue())
+
+        call_command('rebuild_group_totals', stdout=StringIO())
+        self.assertTotals(self.group, 500, -200, 300)
+
+class SummaryServiceTests(TransactionTestCase):
+    def test_owner_summary_is_one_query(self):
+        self.create_transaction(500)
+        self.create_transaction(-200)
+
+        with self.assertNumQueries(1):
+            summary = summarize_owner(self.user)
+
+        self.assertEqual(summary, {'income': 500, 'expenses': -200, 'balance': 300})
+
+    def test_empty_owner_summary_is_zero(self):
+        self.assertEqual(summarize_owner(self.user), {'income': 0, 'expenses': 0, 'balance': 0})
+
+    def test_owner_groups_summary_is_one_query(self):
+        # pylint: disable=E1101
+        other = TransactionGroup.objects.create(name='Savings', owner=self.user)
+        self.create_transaction(500)
+        self.create_transaction(-30, group=other)
+
+        with self.assertNumQueries(1):
+            summaries = summarize_owner_groups(self.user)
+
+        self.assertEqual(summaries, {
+            self.group.uuid: {'income': 500, 'expenses': 0, 'balance': 500},
+            other.uuid: {'income': 0, 'expenses': -30, 'balance': -30},
+        })
+
+class ListTransactionsTests(TransactionTestCase):
+    def test_unpaginated_list_is_ordered_by_created(self):
+        names = [self.create_transaction(amount, name=f'Item {amount}')['name'] for amount in (3, 1, 2)]
+
+        response = self.client.get(f'/transaction/list/{self.group.uuid}')
+
+        self.assertEqual([item['name'] for item in response.data], names)
+
+    def test_cursor_pages_walk_the_whole_group(self):
+        names = [self.create_transaction(index, name=f'Item {index}')['name'] for index in range(5)]
+
+        seen = []
+        url = f'/transaction/list/{self.group.uuid}?page_size=2'
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen.extend(item['name'] for item in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(seen, names)
+
+    def test_filters_are_applied_in_sql(self):
+        self.create_transaction(500, name='Salary')
+        self.create_transaction(-200, name='Rent')
+        self.create_transaction(-20, name='Coffee')
+
+        url = f'/transaction/list/{self.group.uuid}'
+        self.assertEqual([item['name'] for item in self.client.get(url, {'kind': 'income'}).data], ['Salary'])
+        self.assertEqual([item['name'] for item in self.client.get(url, {'kind': 'expense'}).data], ['Rent', 'Coffee'])
+        self.assertEqual([item['name'] for item in self.client.get(url, {'min_amount': -100, 'max_amount': 0}).data], ['Coffee'])
+        self.assertEqual(self.client.get(url, {'since': '2999-01-01T00:00:00Z'}).data, [])
+        self.assertEqual(len(self.client.get(url, {'until': '2999-01-01T00:00:00Z'}).data), 3)
+
+    def test_invalid_filter_is_rejected(self):
+        response = self.client.get(f'/transaction/list/{self.group.uuid}', {'kind': 'refund'})
+
+        self.assertEqual(response.status_code, 400)
+
+class ImportTransactionsTests(TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self, name, content, **data):
+        return self.client.post('/transaction/import', {'file': SimpleUploadedFile(name, content.encode()), **data}, format='multipart')
+
+    def test_csv_rows_are_imported_with_an_error_report(self):
+        # pylint: disable=E1101
+        stranger = GoogleUser.objects.create(first_name='Eve', last_name='Smith', email='eve@example.com', picture='https://example.com/eve.png')
+        foreign = TransactionGroup.objects.create(name='Foreign', owner=stranger)
+        content = (
+            'group,name,amount\n'
+            f'{self.group.uuid},Salary,500\n'
+            f'{self.group.uuid},"Rent, monthly",-200\n'
+            f'{self.group.uuid},Broken,lots\n'
+            f'{foreign.uuid},Sneaky,1\n'
+        )
+
+        response = self.upload('history.csv', content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [3, 4])
+        self.group.refresh_from_db()
+        self.assertEqual((self.group.income, self.group.expenses, self.group.balance), (500, -200, 300))
+        self.assertFalse(Transaction.objects.filter(group=foreign).exists())
+
+    def test_ndjson_rows_are_imported_in_batches(self):
+        content = ''.join(f'{{"group": "{self.group.uuid}", "name": "Item {index}", "amount": {index}}}\n' for index in range(5))
+        content += 'not json\n'
+
+        with mock.patch('transaction.imports.IMPORT_BATCH_SIZE', 2):
+            response = self.upload('history.ndjson', content)
+
+        self.assertEqual(response.data['created'], 5)
+        self.assertEqual(response.data['errors'][0]['row'], 6)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.balance, 10)
+
+    def test_import_requires_authentication(self):
+        self.client.force_authenticate(user=None)
+
+        response = self.upload('history.csv', 'group,name,amount\n')
+
+        self.assertEqual(response.status_code, 401)
+
+class ExportTransactionsTests(TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.user)
+        # pylint: disable=E1101
+        self.other = TransactionGroup.objects.create(name='Savings', owner=self.user)
+        self.create_transaction(500, name='Salary')
+        self.create_transaction(-200, name='Rent, monthly', group=self.other)
+
+    def test_csv_export_streams_every_owned_group(self):
+        response = self.client.get('/transaction/export/csv')
+
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'group,group_name,uuid,name,amount,created')
+        self.assertEqual(len(lines), 3)
+        self.assertIn('"Rent, monthly",-200', ''.join(lines))
+
+    def test_ndjson_export_has_one_object_per_line(self):
+        response = self.client.get('/transaction/export/ndjson')
+
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(sorted(row['amount'] for row in rows), [-200, 500])
+
+    def test_unknown_format_is_not_found(self):
+        self.assertEqual(self.client.get('/transaction/export/xml').status_code, 404)
+
+    async def test_asgi_export_streams_chunk_by_chunk(self):
+        with mock.patch('transaction.exports.EXPORT_CHUNK_SIZE', 1):
+            response = await self.async_client.get('/transaction/export/csv', headers={'Authorization': f'Bearer {user_token(self.user)}'})
+
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(chunks[0], b'group,group_name,uuid,name,amount,created\r\n')
+
+class RollupTests(TransactionTestCase):
+    def rollups(self):
+        # pylint: disable=E1101
+        return sorted(TransactionRollup.objects.exclude(income=0, expenses=0, balance=0).values_list('group', 'period', 'start', 'income', 'expenses', 'balance'))
+
+    def test_rollups_follow_transaction_changes(self):
+        salary = self.create_transaction(500)
+        self.create_transaction(-200)
+        self.client.patch(f"/transaction/{salary['uuid']}", {'amount': 300}, format='json')
+
+        # pylint: disable=E1101
+        day = TransactionRollup.objects.get(group=self.group, period=TransactionRollup.DAY)
+        month = TransactionRollup.objects.get(group=self.group, period=TransactionRollup.MONTH)
+        self.assertEqual((day.income, day.expenses, day.balance), (300, -200, 100))
+        self.assertEqual((month.income, month.expenses, month.balance), (300, -200, 100))
+        self.assertEqual(month.start, day.start.replace(day=1))
+
+        self.client.delete(f"/transaction/{salary['uuid']}")
+        day.refresh_from_db()
+        self.assertEqual(day.balance, -200)
+
+    def test_backfill_matches_incremental_rollups(self):
+        self.create_transaction(500)
+        self.create_transaction(-200)
+        incremental = self.rollups()
+
+        call_command('backfill_rollups', stdout=StringIO())
+
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_series_spans_days_and_groups(self):
+        # pylint: disable=E1101
+        other = TransactionGroup.objects.create(name='Savings', owner=self.user)
+        self.create_transaction(500)
+        self.create_transaction(-50, group=other)
+        Transaction.objects.filter(group=other).update(created=datetime(2024, 2, 10, tzinfo=timezone.utc))
+        call_command('backfill_rollups', stdout=StringIO())
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get('/transaction/rollups', {'period': 'month', 'until': '2024-03-01'})
+        self.assertEqual([(row['start'], row['balance']) for row in response.data], [(datetime(2024, 2, 1).date(), -50)])
+
+        response = self.client.get('/transaction/rollups', {'period': 'day', 'group': str(self.group.uuid)})
+        self.assertEqual([row['income'] for row in response.data], [500])
+
+class ArchiveTests(TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.old = self.create_transaction(500)
+            self.create_transaction(-200)
+            self.live = self.create_transaction(-30)
+        # pylint: disable=E1101
+        Transaction.objects.exclude(uuid=self.live['uuid']).update(created=datetime(2024, 2, 10, tzinfo=timezone.utc))
+        call_command('backfill_rollups', stdout=StringIO())
+
+    def test_archive_moves_closed_months_and_keeps_summaries(self):
+        summary = summarize_owner(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archive_transactions', '--before', '2024-03', stdout=StringIO())
+
+        # pylint: disable=E1101
+        self.assertEqual([str(uuid) for uuid in Transaction.objects.values_list('uuid', flat=True)], [self.live['uuid']])
+        self.assertEqual(ArchivedTransaction.objects.count(), 2)
+        self.assertEqual(summarize_owner(self.user), summary)
+        self.assertEqual(self.client.get(f"/transaction/{self.old['uuid']}").status_code, 404)
+        self.assertEqual(len(self.client.get(f'/transaction/list/{self.group.uuid}').data), 1)
+
+        response = self.client.get('/transaction/rollups', {'period': 'month', 'until': '2024-03-01'})
+        self.assertEqual([row['balance'] for row in response.data], [300])
+        call_command('rebuild_group_totals', '--check', stdout=StringIO())
+
+        rows = b''.join(self.client.get('/transaction/export/csv').streaming_content).decode().splitlines()
+        self.assertEqual(len(rows), 4)
+
+    def test_archived_rows_stay_readable(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archive_transactions', '--before', '2024-03', stdout=StringIO())
+
+        response = self.client.get(f'/transaction/list/{self.group.uuid}/archived', {'kind': 'income'})
+        self.assertEqual([row['uuid'] for row in response.data], [self.old['uuid']])
+        self.assertEqual(response.data[0]['created'], '2024-02-10T00:00:00Z')
+        self.assertEqual(len(self.client.get(f'/transaction/list/{self.group.uuid}/archived').data), 2)
+
+        response = self.client.get(f"/transaction/archived/{self.old['uuid']}")
+        self.assertEqual((response.data['amount'], response.data['group']), (500, self.group.uuid))
+        self.assertEqual(self.client.get(f"/transaction/archived/{self.live['uuid']}").status_code, 404)
+
+    def test_archive_moves_rows_in_slices(self):
+        summary = summarize_owner(self.user)
+
+        with mock.patch('transaction.services.ARCHIVE_CHUNK_SIZE', 1), mock.patch('transaction.services.invalidate_groups') as invalidate:
+            call_command('archive_transactions', '--before', '2024-03', stdout=StringIO())
+
+        # pylint: disable=E1101
+        self.assertEqual(ArchivedTransaction.objects.count(), 2)
+        self.assertEqual(summarize_owner(self.user), summary)
+        invalidate.assert_called_once_with([self.group.uuid])
+        month = TransactionRollup.objects.get(period=TransactionRollup.MONTH, start=datetime(2024, 2, 1).date())
+        self.assertEqual((month.frozen, month.balance), (True, 300))
+
+    def test_frozen_rollups_survive_backfill(self):
+        call_command('archive_transactions', '--before', '2024-03', stdout=StringIO())
+        call_command('backfill_rollups', stdout=StringIO())
+
+        # pylint: disable=E1101
+        month = TransactionRollup.objects.get(period=TransactionRollup.MONTH, start=datetime(2024, 2, 1).date())
+        self.assertTrue(month.frozen)
+        self.assertEqual((month.income, month.expenses, month.balance), (500, -200, 300))
+
+class GroupDeletionTests(TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.user)
+        # pylint: disable=E1101
+        self.other = TransactionGroup.objects.create(name='Savings', owner=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.salary = self.create_transaction(500)
+            for amount in (-10, -20, -30):
+                self.create_transaction(amount)
+            self.create_transaction(40, group=self.other)
+
+    @override_settings(GROUP_PURGE_DEFERRED=False, GROUP_PURGE_CHUNK_SIZE=2)
+    def test_delete_purges_rows_in_chunks(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/transaction/group/{self.group.uuid}')
+
+        self.assertEqual(response.status_code, 204)
+        # pylint: disable=E1101
+        self.assertFalse(TransactionGroup.all_objects.filter(uuid=self.group.uuid).exists())
+        self.assertFalse(Transaction.objects.filter(group_id=self.group.uuid).exists())
+        self.assertFalse(TransactionRollup.objects.filter(group_id=self.group.uuid).exists())
+        self.assertEqual(summarize_owner(self.user), {'income': 40, 'expenses': 0, 'balance': 40})
+
+    def test_deferred_delete_hides_group_until_purged(self):
+        # The default: the request only flips the flag
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(5):
+                self.client.delete(f'/transaction/group/{self.group.uuid}')
+
+        # pylint: disable=E1101
+        self.assertEqual(Transaction.objects.filter(group_id=self.group.uuid).count(), 4)
+        self.assertEqual(self.client.get(f'/transaction/group/{self.group.uuid}').status_code, 404)
+        self.assertEqual(self.client.get(f"/transaction/{self.salary['uuid']}").status_code, 404)
+        self.assertEqual([group['uuid'] for group in self.client.get(f'/transaction/list/group/{self.user.uuid}').data], [str(self.other.uuid)])
+        self.assertEqual(summarize_owner(self.user), {'income': 40, 'expenses': 0, 'balance': 40})
+
+        call_command('purge_deleted_groups', stdout=StringIO())
+
+        self.assertFalse(Transaction.objects.filter(group_id=self.group.uuid).exists())
+        self.assertFalse(TransactionGroup.all_objects.filter(uuid=self.group.uuid).exists())
+
+    def test_batches_cannot_touch_rows_of_a_deleted_group(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/transaction/group/{self.group.uuid}')
+
+        response = self.client.post('/transaction/batch-transaction', {'operations': [
+            {'op': 'update', 'uuid': self.salary['uuid'], 'data': {'group': str(self.other.uuid)}},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['results'][0]['errors'], {'uuid': ['Not found']})
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.balance, 40)
+
+class GroupNameTests(TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.user)
+
+    def create_group(self, name, owner=None):
+        return self.client.post('/transaction/create-group', {'name': name, 'owner': str((owner or self.user).uuid)}, format='json')
+
+    def test_names_are_unique_per_owner(self):
+        # pylint: disable=E1101
+        other = GoogleUser.objects.create(first_name='Grace', last_name='Hopper', email='grace@example.com', picture='')
+
+        self.assertEqual(self.create_group('Wallet').status_code, 400)
+        self.assertEqual(self.create_group('Wallet', owner=other).status_code, 201)
+        self.assertEqual(self.client.patch(f'/transaction/group/{self.group.uuid}', {'name': 'Wallet'}, format='json').status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/transaction/group/{self.group.uuid}')
+        self.assertEqual(self.create_group('Wallet').status_code, 201)
+
+    def test_lookup_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/transaction/group/lookup', {'name': 'Wallet'})
+        self.assertEqual(response.data, {'exists': True, 'uuid': self.group.uuid})
+
+        response = self.client.get('/transaction/group/lookup', {'name': 'Savings'})
+        self.assertEqual(response.data, {'exists': False, 'uuid': None})
+
+    def test_batch_rejects_clashing_names(self):
+        response = self.client.post('/transaction/batch-group', {'operations': [
+            {'op': 'create', 'data': {'name': 'Savings'}},
+            {'op': 'create', 'data': {'name': 'Savings'}},
+            {'op': 'create', 'data': {'name': 'Wallet'}},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([result.get('errors') is not None for result in response.data['results']], [False, True, True])
+
+        response = self.client.post('/transaction/batch-group', {'operations': [
+            {'op': 'delete', 'uuid': str(self.group.uuid)},
+            {'op': 'create', 'data': {'name': 'Wallet'}},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+class RepresentationTests(TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.user)
+        for index, name in enumerate(['Café "au lait"', 'Line\u2028break', 'Plain']):
+            self.create_transaction(index - 1, name=name)
+        # pylint: disable=E1101
+        Transaction.objects.filter(name='Plain').update(created=datetime(2024, 2, 10, 8, 30, 5, 123456, tzinfo=timezone.utc))
+
+    def test_lists_match_model_serializer_bytes(self):
+        # pylint: disable=E1101
+        transactions = Transaction.objects.filter(group=self.group).order_by('created', 'uuid')
+        groups = TransactionGroup.objects.filter(owner=self.user).order_by('created', 'uuid')
+
+        response = self.client.get(f'/transaction/list/{self.group.uuid}')
+        self.assertEqual(response.content, JSONRenderer().render(TransactionSerializer(transactions, many=True).data))
+        response = self.client.get(f'/transaction/list/group/{self.user.uuid}')
+        self.assertEqual(response.content, JSONRenderer().render(TransactionGroupSerializer(groups, many=True).data))
+
+        response = self.client.get(f'/transaction/list/{self.group.uuid}', {'page_size': 2})
+        self.assertEqual(JSONRenderer().render(response.data['results']), JSONRenderer().render(TransactionSerializer(transactions[:2], many=True).data))
+
+    def test_orjson_renderer_matches_json_renderer(self):
+        # Without orjson installed this exercises the fallback
+        data = self.client.get(f'/transaction/list/{self.group.uuid}').data
+        data.append({'uuid': self.group.uuid, 'created': datetime(2024, 2, 10, 8, 30, 5, 123456, tzinfo=timezone.utc), 'owner': None})
+
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+@skipUnless('replica' in settings.DATABASES, 'needs the replica stand-in from server.settings_test')
+@override_settings(DB_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        super().setUp()
+        # The replica has caught up with the user and group, but nothing written from here on reaches it
+        # pylint: disable=E1101
+        GoogleUser.objects.using('replica').create(uuid=self.user.uuid, first_name='Ada', last_name='Lovelace', email='ada@example.com', picture='')
+        TransactionGroup.objects.using('replica').create(uuid=self.group.uuid, name=self.group.name, owner_id=self.user.uuid)
+
+    def test_writers_read_their_writes_from_the_primary(self):
+        with self.assertNumQueries(1, using='replica'):
+            response = self.client.get(f'/transaction/list/group/{self.user.uuid}')
+        self.assertEqual(len(response.data), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_transaction(500)
+
+        with self.assertNumQueries(0, using='replica'):
+            response = self.client.get(f'/transaction/list/{self.group.uuid}')
+        self.assertEqual(len(response.data), 1)
+
+        # Once the pin expires reads go back to the replica, which here never catches up
+        cache.clear()
+        self.assertEqual(self.client.get(f'/transaction/list/{self.group.uuid}').data, [])
+
+    def test_only_opted_in_views_use_the_replica(self):
+        self.client.force_authenticate(user=self.user)
+
+        with self.assertNumQueries(1, using='replica'):
+            self.assertEqual(self.client.get('/social_auth/user/').data['balance'], 0)
+        with self.assertNumQueries(0, using='replica'):
+            self.client.get('/transaction/dashboard')
+            self.client.get(f'/transaction/group/{self.group.uuid}')
+
+    def test_replicas_need_a_shared_cache(self):
+        # Pins written to one worker's local memory would not keep another worker off the replica
+        with self.assertRaises(ImproperlyConfigured):
+            check_replica_cache()
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+            check_replica_cache()
+
+@override_settings(RESPONSE_CACHE_ENABLED=True)
+class ResponseCacheTests(TransactionTestCase):
+    def write(self, method, url, data=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(url, data, format='json')
+
+    @override_settings(RESPONSE_CACHE_ENABLED=None)
+    def test_process_local_cache_is_off_by_default(self):
+        # Another worker's write only bumps versions in its own memory, so nothing may be served from this one's
+        url = f'/transaction/list/group/{self.user.uuid}'
+        etag = self.client.get(url)['ETag']
+        # pylint: disable=E1101
+        TransactionGroup.objects.filter(uuid=self.group.uuid).update(name='Renamed elsewhere')
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['name'], 'Renamed elsewhere')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_repeat_list_is_served_from_cache(self):
+        url = f'/transaction/list/group/{self.user.uuid}'
+        first = self.client.get(url)
+
+        hits = cache_stats['hits']
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+
+        self.assertEqual(cache_stats['hits'], hits + 1)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_matching_etag_is_not_modified(self):
+        url = f'/transaction/list/{self.group.uuid}'
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_transaction_write_invalidates_owner_and_group(self):
+        groups_url = f'/transaction/list/group/{self.user.uuid}'
+        transactions_url = f'/transaction/list/{self.group.uuid}'
+        self.client.get(groups_url)
+        self.client.get(transactions_url)
+
+        self.write('post', '/transaction/create-transaction', {'name': 'Salary', 'group': str(self.group.uuid), 'amount': 500})
+
+        self.assertEqual(self.client.get(groups_url).data[0]['balance'], 500)
+        self.assertEqual([item['name'] for item in self.client.get(transactions_url).data], ['Salary'])
+
+    def test_unrelated_group_keeps_its_cache(self):
+        # pylint: disable=E1101
+        other = TransactionGroup.objects.create(name='Savings', owner=self.user)
+        url = f'/transaction/list/{other.uuid}'
+        self.client.get(url)
+
+        self.write('post', '/transaction/create-transaction', {'name': 'Salary', 'group': str(self.group.uuid), 'amount': 500})
+
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_group_delete_invalidates_its_transactions(self):
+        salary = self.write('post', '/transaction/create-transaction', {'name': 'Salary', 'group': str(self.group.uuid), 'amount': 500}).data
+        url = f"/transaction/{salary['uuid']}"
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.write('delete', f'/transaction/group/{self.group.uuid}')
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+class BatchTests(TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.user)
+
+    def batch(self, url, operations):
+        return self.client.post(url, {'operations': operations}, format='json')
+
+    def test_transaction_batch_applies_every_operation(self):
+        salary = self.create_transaction(500, name='Salary')
+        rent = self.create_transaction(-200, name='Rent')
+
+        response = self.batch('/transaction/batch-transaction', [
+            {'op': 'create', 'data': {'name': 'Bonus', 'group': str(self.group.uuid), 'amount': 100}},
+            {'op': 'update', 'uuid': salary['uuid'], 'data': {'amount': 600}},
+            {'op': 'delete', 'uuid': rent['uuid']},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.data['results']], ['created', 'updated', 'deleted'])
+        self.assertEqual(response.data['results'][1]['data']['amount'], 600)
+        # pylint: disable=E1101
+        self.assertEqual(sorted(Transaction.objects.values_list('name', flat=True)), ['Bonus', 'Salary'])
+        self.group.refresh_from_db()
+        self.assertEqual((self.group.income, self.group.expenses, self.group.balance), (700, 0, 700))
+
+    def test_invalid_operation_rolls_back_the_batch(self):
+        salary = self.create_transaction(500, name='Salary')
+
+        response = self.batch('/transaction/batch-transaction', [
+            {'op': 'update', 'uuid': salary['uuid'], 'data': {'amount': 600}},
+            {'op': 'create', 'data': {'name': 'Bonus', 'group': str(self.group.uuid), 'amount': 'many'}},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('amount', response.data['results'][1]['errors'])
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.balance, 500)
+
+    def test_foreign_transactions_are_not_found(self):
+        # pylint: disable=E1101
+        stranger = GoogleUser.objects.create(first_name='Eve', last_name='Smith', email='eve@example.com', picture='https://example.com/eve.png')
+        foreign = TransactionGroup.objects.create(name='Foreign', owner=stranger)
+        item = Transaction.objects.create(name='Theirs', group=foreign, amount=5)
+
+        response = self.batch('/transaction/batch-transaction', [{'op': 'delete', 'uuid': str(item.uuid)}])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(Transaction.objects.filter(uuid=item.uuid).exists())
+
+    def test_group_batch(self):
+        response = self.batch('/transaction/batch-group', [
+            {'op': 'create', 'data': {'name': 'Savings'}},
+            {'op': 'update', 'uuid': str(self.group.uuid), 'data': {'name': 'Daily'}},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        # pylint: disable=E1101
+        self.assertEqual(sorted(TransactionGroup.objects.filter(owner=self.user).values_list('name', flat=True)), ['Daily', 'Savings'])
+
+        response = self.batch('/transaction/batch-group', [{'op': 'delete', 'uuid': response.data['results'][0]['uuid']}])
+        self.assertEqual(TransactionGroup.objects.filter(owner=self.user).count(), 1)
+
+class DashboardTests(TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.user)
+
+    def test_dashboard_uses_a_fixed_number_of_queries(self):
+        # pylint: disable=E1101
+        other = TransactionGroup.objects.create(name='Savings', owner=self.user)
+        for index in range(4):
+            self.create_transaction(100 + index, name=f'Income {index}')
+            self.create_transaction(-(10 + index), name=f'Expense {index}', group=other)
+
+        # Groups, then one windowed query per prefetched slice
+        with self.assertNumQueries(3):
+            response = self.client.get('/transaction/dashboard', {'recent': 2})
+
+        self.assertEqual(response.data['user']['balance'], 406 - 46)
+        wallet, savings = response.data['groups']
+        self.assertEqual([item['name'] for item in wallet['recent_income']], ['Income 3', 'Income 2'])
+        self.assertEqual(wallet['recent_expenses'], [])
+        self.assertEqual([item['amount'] for item in savings['recent_expenses']], [-13, -12])
+
+    def test_query_count_does_not_grow_with_groups(self):
+        for index in range(10):
+            # pylint: disable=E1101
+            group = TransactionGroup.objects.create(name=f'Group {index}', owner=self.user)
+            self.create_transaction(index + 1, group=group)
+
+        with self.assertNumQueries(3):
+            self.client.get('/transaction/dashboard')
+
+class EventTests(TransactionTestCase):
+    def test_writes_publish_deltas_to_the_owner_after_commit(self):
+        broker = mock.Mock()
+        with mock.patch('transaction.events.get_broker', return_value=broker):
+            with self.captureOnCommitCallbacks() as callbacks:
+                created = self.create_transaction(-40, name='Lunch')
+            broker.publish.assert_not_called()
+            for callback in callbacks:
+                callback()
+
+        channel, event = broker.publish.call_args.args
+        self.assertEqual(channel, owner_channel(self.user.uuid))
+        self.assertEqual(event['type'], 'transactions')
+        self.assertEqual([item['uuid'] for item in event['saved']], [created['uuid']])
+        self.assertEqual(event['groups'], {str(self.group.uuid): {'income': 0, 'expenses': -40, 'balance': -40}})
+
+    def test_imports_publish_one_event_without_the_rows(self):
+        self.client.force_authenticate(user=self.user)
+        content = ''.join(f'{{"group": "{self.group.uuid}", "name": "Item {index}", "amount": {index}}}\n' for index in range(5))
+        broker = mock.Mock()
+        with mock.patch('transaction.events.get_broker', return_value=broker), mock.patch('transaction.imports.IMPORT_BATCH_SIZE', 2):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post('/transaction/import', {'file': SimpleUploadedFile('history.ndjson', content.encode())}, format='multipart')
+
+        broker.publish.assert_called_once()
+        channel, event = broker.publish.call_args.args
+        self.assertEqual(channel, owner_channel(self.user.uuid))
+        self.assertEqual(event, {'type': 'transactions', 'changed': 5, 'groups': {str(self.group.uuid): {'income': 10, 'expenses': 0, 'balance': 10}}})
+
+    async def test_stream_delivers_published_events(self):
+        stream = event_stream(self.user.uuid)
+        self.assertTrue((await anext(stream)).startswith('retry:'))
+        self.assertTrue((await anext(stream)).startswith('event: ready'))
+        self.assertEqual(get_broker().connection_count(), 1)
+
+        get_broker().publish(owner_channel(self.user.uuid), {'type': 'groups', 'saved': [], 'deleted': ['x']})
+        self.assertEqual(await anext(stream), 'event: groups\ndata: {"type": "groups", "saved": [], "deleted": ["x"]}\n\n')
+
+        await stream.aclose()
+        self.assertEqual(get_broker().connection_count(), 0)
+
+    async def test_stream_requires_a_valid_token(self):
+        response = await self.async_client.get('/transaction/events')
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get('/transaction/events', headers={'Authorization': 'Bearer nonsense'})
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get('/transaction/events', headers={'Authorization': 'Bearer \xff'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_stream_is_refused_under_wsgi(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get('/transaction/events')
+        self.assertEqual(response.status_code, 501)
+        self.assertNotIsInstance(response, StreamingHttpResponse)
+
+class SearchTests(TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.user)
+
+    def search(self, query, **params):
+        response = self.client.get('/transaction/search', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_prefix_terms_match_whole_words(self):
+        self.create_transaction(-5, name='Coffee beans')
+        self.create_transaction(-3, name='Iced coffee')
+        self.create_transaction(-9, name='Toffee')
+
+        self.assertEqual(sorted(item['name'] for item in self.search('cof')['results']), ['Coffee beans', 'Iced coffee'])
+        self.assertEqual([item['name'] for item in self.search('COFFEE be')['results']], ['Coffee beans'])
+        self.assertEqual(self.search('offee')['results'], [])
+
+    def test_search_is_scoped_to_the_user(self):
+        # pylint: disable=E1101
+        other = GoogleUser.objects.create(first_name='Grace', last_name='Hopper', email='grace@example.com', picture='https://example.com/grace.png')
+        other_group = TransactionGroup.objects.create(name='Other', owner=other)
+        Transaction.objects.create(name='Rent', amount=-900, group=other_group)
+        self.create_transaction(-800, name='Rent')
+
+        results = self.search('rent')['results']
+        self.assertEqual([item['group'] for item in results], [self.group.uuid])
+
+    def test_index_follows_updates_and_deletes(self):
+        created = self.create_transaction(-5, name='Bus ticket')
+        self.assertEqual(len(self.search('bus')['results']), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/transaction/{created['uuid']}", {'name': 'Train ticket'}, format='json')
+        self.assertEqual(self.search('bus')['results'], [])
+        self.assertEqual(len(self.search('train')['results']), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/transaction/{created['uuid']}")
+        self.assertEqual(self.search('train')['results'], [])
+
+    def test_results_are_paginated_without_a_count(self):
+        for index in range(3):
+            self.create_transaction(-index - 1, name=f'Snack {index}')
+
+        page = self.search('snack', limit=2)
+        self.assertEqual(len(page['results']), 2)
+        self.assertNotIn('count', page)
+        self.assertIn('offset=2', page['next'])
+        self.assertIsNone(self.search('snack', limit=2, offset=2)['next'])
+
+    def test_best_match_ranks_first_among_many(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            best = self.create_transaction(-5, name='Coffee coffee')
+        # pylint: disable=E1101
+        Transaction.objects.bulk_create(Transaction(name=f'Coffee beans {index}', amount=-1, group=self.group) for index in range(300))
+
+        page = self.search('coffee', limit=3)
+        self.assertEqual(page['results'][0]['uuid'], best['uuid'])
+        # Equal scores stay newest first
+        self.assertEqual([item['name'] for item in page['results'][1:]], ['Coffee beans 299', 'Coffee beans 298'])
+        self.assertEqual(len(self.search('coffee', limit=100, offset=250)['results']), 51)
+
+    def test_only_the_newest_matches_are_ranked(self):
+        for index in range(4):
+            self.create_transaction(-1, name=f'Tea {index}')
+
+        with mock.patch('transaction.search.MAX_SEARCH_CANDIDATES', 3):
+            results = self.search('tea')['results']
+
+        self.assertEqual([item['name'] for item in results], ['Tea 3', 'Tea 2', 'Tea 1'])
+
+    def test_single_letters_match_whole_words(self):
+        self.create_transaction(-5, name='Vitamin C')
+        self.create_transaction(-3, name='Coffee')
+
+        self.assertEqual([item['name'] for item in self.search('c')['results']], ['Vitamin C'])
+        self.assertEqual([item['name'] for item in self.search('co')['results']], ['Coffee'])
+
+    def test_long_terms_rank_exact_prefixes_first(self):
+        self.create_transaction(-5, name='Insurance')
+        self.create_transaction(-3, name='Insurancy')
+
+        self.assertEqual([item['name'] for item in self.search('insurance')['results']], ['Insurance', 'Insurancy'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'PostgreSQL full-text index')
+    def test_postgresql_candidates_come_from_an_index(self):
+        # pylint: disable=E1101
+        candidates = search_candidates(Transaction.objects.filter(group=self.group), ['cof', 'be'])[:MAX_SEARCH_CANDIDATES]
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            sql, params = candidates.query.sql_with_params()
+            cursor.execute(f'EXPLAIN {sql}', params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        # The name index, or the time-ordered primary key walked backwards; never a scan of the table
+        self.assertNotIn('Seq Scan on transaction_transaction ', plan)
+
+    def test_query_without_terms_is_empty(self):
+        self.assertEqual(self.search('--')['results'], [])
+        self.assertEqual(self.client.get('/transaction/search').status_code, 400)
+
+class PerformanceTests(TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.user)
+
+    def test_server_timing_reports_query_count(self):
+        self.assertNotIn('Server-Timing', self.client.get('/transaction/dashboard'))
+
+        with override_settings(SERVER_TIMING_ENABLED=True):
+            response = self.client.get('/transaction/dashboard')
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="3 queries"$')
+
+    @override_settings(PERF_N_PLUS_ONE_THRESHOLD=3)
+    def test_repeated_query_is_logged_with_its_call_site(self):
+        # pylint: disable=E1101
+        groups = [TransactionGroup.objects.create(name=f'Group {index}', owner=self.user) for index in range(3)]
+
+        def per_group_view(request):
+            for group in groups:
+                Transaction.objects.filter(group=group).count()
+            return Response({})
+
+        with self.assertLogs('server.performance', 'WARNING') as logs:
+            PerformanceMiddleware(per_group_view)(RequestFactory().get('/'))
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('3 runs of the same query', logs.output[0])
+        self.assertIn('tests.py', logs.output[0])
+        self.assertIn('in per_group_view', logs.output[0])
+
+    def test_metrics_endpoint_is_opt_in(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+        self.client.get('/transaction/dashboard')
+        with override_settings(PERF_METRICS_ENABLED=True):
+            response = self.client.get('/metrics')
+        dashboard = response.data['GET transaction:Dashboard']
+        self.assertGreaterEqual(dashboard['duration_ms']['count'], 1)
+        self.assertEqual(dashboard['queries']['max'], 3)
+
+class FactoryTests(TestCase):
+    def test_seeded_totals_and_rollups_match_the_rows(self):
+        owners = seed_users(users=2, groups=3, transactions=20)
+
+        self.assertEqual(Transaction.objects.filter(group__owner__in=owners).count(), 2 * 3 * 20)
+        out = StringIO()
+        call_command('rebuild_group_totals', '--check', stdout=out)
+        self.assertIn('All group totals are consistent', out.getvalue())
+        self.assertEqual(
+            TransactionRollup.objects.filter(period=TransactionRollup.MONTH).aggregate(total=Sum('balance'))['total'],
+            Transaction.objects.aggregate(total=Sum('amount'))['total'],
+        )
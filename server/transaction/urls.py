@@ -1,13 +1,25 @@
 from django.urls import path
 
-from .views import ListTransactions, TransactionDetail, CreateTransaction, CreateGroup, TransactionGroupDetail, ListGroups
+from .views import ListTransactions, ListArchivedTransactions, ArchivedTransactionDetail, SearchTransactions, TransactionDetail, CreateTransaction, CreateGroup, TransactionGroupDetail, ListGroups, GroupLookup, ImportTransactions, ExportTransactions, ListRollups, CacheStats, BatchTransactions, BatchGroups, Dashboard, TransactionEvents
 
 urlpatterns = [
     path('list/<uuid:uuid>',ListTransactions.as_view(), name='List Transactions from Group'),
+    path('list/<uuid:uuid>/archived', ListArchivedTransactions.as_view(), name='List Archived Transactions from Group'),
+    path('archived/<uuid:uuid>', ArchivedTransactionDetail.as_view(), name='Retrieve Archived Transaction'),
+    path('search', SearchTransactions.as_view(), name='Search Transactions'),
     path('<uuid:uuid>',TransactionDetail.as_view(), name='Retrieve Transaction'),
     path('create-transaction',CreateTransaction.as_view(), name='Create Transaction'),
+    path('batch-transaction', BatchTransactions.as_view(), name='Batch Transactions'),
     path('list/group/<uuid:uuid>', ListGroups.as_view(), name="List Transaction Groups"),
+    path('group/lookup', GroupLookup.as_view(), name='Look Up Transaction Group'),
     path('group/<uuid:uuid>', TransactionGroupDetail.as_view(), name='Retrieve Transaction Group'),
-    path('create-group', CreateGroup.as_view(), name='Create Transaction Group')
+    path('create-group', CreateGroup.as_view(), name='Create Transaction Group'),
+    path('batch-group', BatchGroups.as_view(), name='Batch Transaction Groups'),
+    path('dashboard', Dashboard.as_view(), name='Dashboard'),
+    path('events', TransactionEvents.as_view(), name='Transaction Events'),
+    path('import', ImportTransactions.as_view(), name='Import Transactions'),
+    path('export/<str:file_format>', ExportTransactions.as_view(), name='Export Transactions'),
+    path('rollups', ListRollups.as_view(), name='List Transaction Rollups'),
+    path('cache-stats', CacheStats.as_view(), name='Response Cache Stats'),
 ]
 
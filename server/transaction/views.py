@@ -1,60 +1,157 @@
-from rest_framework.generics import ListAPIView,RetrieveUpdateDestroyAPIView, CreateAPIView
+import jwt
 
-from django.db.models import Q, Sum
+from rest_framework import status
+from rest_framework.authentication import get_authorization_header
+from rest_framework.generics import ListAPIView,RetrieveAPIView,RetrieveUpdateDestroyAPIView, CreateAPIView
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from .models import Transaction, TransactionGroup
-from .serializers import TransactionSerializer, TransactionGroupSerializer
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Prefetch
+from django.db.transaction import atomic
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views import View
+
+from .models import ArchivedTransaction, Transaction, TransactionGroup
 from social_auth.models import GoogleUser
+from social_auth.serializers import GoogleUserSerializer
+from social_auth.services import verify_jwt_token
+from .pagination import CreatedCursorPagination, RankedPagination
+from .batches import apply_group_batch, apply_transaction_batch
+from .caching import CachedResponseMixin, cache_stats, group_scope, invalidate_groups, owner_scope, transaction_scope
+from .events import event_stream, publish_group_changes
+from .exports import WRITERS, export_rows, stream_async
+from .imports import READERS, import_transactions
+from .representations import ValuesListMixin
+from .search import search_transactions
+from .serializers import TransactionSerializer, ArchivedTransactionSerializer, TransactionGroupSerializer, TransactionFilterSerializer, TransactionSearchSerializer, GroupLookupSerializer, TransactionImportInputSerializer, RollupFilterSerializer, BatchInputSerializer, DashboardGroupSerializer, DashboardInputSerializer
+from .services import TOTAL_FIELDS, delete_groups, purge_groups, record_transaction_changes, rollup_series
 
-class ListTransactions(ListAPIView):
+class ListTransactions(CachedResponseMixin, ValuesListMixin, ListAPIView):
     serializer_class = TransactionSerializer
+    pagination_class = CreatedCursorPagination
+    replica_reads = True
+
+    def get_cache_scopes(self):
+        return [group_scope(self.kwargs['uuid'])]
+
+    model = Transaction
 
     def get_queryset(self):
         uuid = self.kwargs['uuid']
         #pylint: disable=E1101
-        transactions = Transaction.objects.filter(group__uuid=uuid)
-        return sorted(transactions,key=lambda x: x.created)
-    
-class ListGroups(ListAPIView):
+        transactions = self.model.objects.filter(group__uuid=uuid, group__deleted=False).order_by('created','uuid')
+
+        filter_serializer = TransactionFilterSerializer(data=self.request.query_params)
+        filter_serializer.is_valid(raise_exception=True)
+        filters = filter_serializer.validated_data
+
+        if filters.get('kind') == 'income':
+            transactions = transactions.filter(amount__gt=0)
+        elif filters.get('kind') == 'expense':
+            transactions = transactions.filter(amount__lt=0)
+        if 'since' in filters:
+            transactions = transactions.filter(created__gte=filters['since'])
+        if 'until' in filters:
+            transactions = transactions.filter(created__lt=filters['until'])
+        if 'min_amount' in filters:
+            transactions = transactions.filter(amount__gte=filters['min_amount'])
+        if 'max_amount' in filters:
+            transactions = transactions.filter(amount__lte=filters['max_amount'])
+        return transactions
+
+class ListArchivedTransactions(ListTransactions):
+    # Rows archive_transactions moved out of closed months; same filters and pages as the live list
+    serializer_class = ArchivedTransactionSerializer
+    model = ArchivedTransaction
+
+class ListGroups(CachedResponseMixin, ValuesListMixin, ListAPIView):
     serializer_class = TransactionGroupSerializer
+    pagination_class = CreatedCursorPagination
+    replica_reads = True
+
+    def get_cache_scopes(self):
+        return [owner_scope(self.kwargs['uuid'])]
 
     def get_queryset(self):
         uuid = self.kwargs['uuid']
         #pylint: disable=E1101
-        groups = TransactionGroup.objects.filter(owner__uuid=uuid)
-        for group in groups:
-            transactions = Transaction.objects.filter(group=group.uuid)     
-
-            group.income = transactions.aggregate(value=Sum('amount',filter=Q(amount__gt=0))).get('value')
-            group.expenses = transactions.aggregate(value=Sum('amount',filter=Q(amount__lt=0))).get('value')
-            
-            if group.income is None:
-                group.income = 0
-                if group.expenses is None:
-                    group.expenses = 0
-                    group.balance = 0
-                else:
-                    group.balance = group.expenses
-            else:
-                if group.expenses is None:
-                    group.expenses = 0
-                    group.balance = group.income
-                else:
-                    group.balance = transactions.aggregate(value=Sum('amount')).get('value')
-
-            group.save()
-        return sorted(groups,key=lambda x: x.created)
-
-class TransactionDetail(RetrieveUpdateDestroyAPIView):
+        groups = TransactionGroup.objects.filter(owner__uuid=uuid).order_by('created','uuid')
+        return groups
+
+class SearchTransactions(CachedResponseMixin, ListAPIView):
+    serializer_class = TransactionSerializer
+    pagination_class = RankedPagination
+    permission_classes = [IsAuthenticated]
+
+    def get_cache_scopes(self):
+        return [owner_scope(self.request.user.pk)]
+
+    def get_queryset(self):
+        filter_serializer = TransactionSearchSerializer(data=self.request.query_params)
+        filter_serializer.is_valid(raise_exception=True)
+        filters = filter_serializer.validated_data
+
+        #pylint: disable=E1101
+        transactions = Transaction.objects.filter(group__owner=self.request.user, group__deleted=False)
+        if 'group' in filters:
+            transactions = transactions.filter(group__uuid=filters['group'])
+        return search_transactions(transactions, filters['q'])
+
+class TransactionDetail(CachedResponseMixin, RetrieveUpdateDestroyAPIView):
     serializer_class = TransactionSerializer
     lookup_field = 'uuid'
-    
+
+    def get_cache_scopes(self):
+        return [transaction_scope(self.kwargs['uuid'])]
+
+    def get_data_cache_scopes(self, data):
+        return [group_scope(data['group'])]
+
     def get_queryset(self):
         uuid = self.kwargs['uuid']
         #pylint: disable=E1101
-        transaction = Transaction.objects.filter(uuid=uuid)
+        transaction = Transaction.objects.filter(uuid=uuid, group__deleted=False)
         return transaction
 
+    @atomic
+    def perform_update(self, serializer):
+        # Re-read the stored row under lock so concurrent edits apply their deltas in turn
+        #pylint: disable=E1101
+        group_id, amount, created = Transaction.objects.select_for_update().values_list('group_id','amount','created').get(uuid=serializer.instance.uuid)
+        previous = Transaction(uuid=serializer.instance.uuid, group_id=group_id, amount=amount, created=created)
+        instance = serializer.save()
+        record_transaction_changes(added=[instance], removed=[previous])
+
+    @atomic
+    def perform_destroy(self, instance):
+        # As in perform_update: an edit committed since get_object() must be the row whose totals are removed
+        #pylint: disable=E1101
+        stored = Transaction.objects.select_for_update().filter(uuid=instance.uuid).values_list('group_id','amount','created').first()
+        if stored is None:
+            raise Http404
+        group_id, amount, created = stored
+        record_transaction_changes(removed=[Transaction(uuid=instance.uuid, group_id=group_id, amount=amount, created=created)])
+        instance.delete()
+
+class ArchivedTransactionDetail(CachedResponseMixin, RetrieveAPIView):
+    # Archived rows are read-only
+    serializer_class = ArchivedTransactionSerializer
+    lookup_field = 'uuid'
+
+    def get_cache_scopes(self):
+        return [transaction_scope(self.kwargs['uuid'])]
+
+    def get_data_cache_scopes(self, data):
+        return [group_scope(data['group'])]
+
+    def get_queryset(self):
+        #pylint: disable=E1101
+        return ArchivedTransaction.objects.filter(uuid=self.kwargs['uuid'], group__deleted=False)
+
 class TransactionGroupDetail(RetrieveUpdateDestroyAPIView):
     serializer_class = TransactionGroupSerializer
     lookup_field = 'uuid'
@@ -64,15 +161,173 @@ class TransactionGroupDetail(RetrieveUpdateDestroyAPIView):
         #pylint: disable=E1101
         group = TransactionGroup.objects.filter(uuid=uuid)
         return group
-    
+
+    @atomic
+    def perform_update(self, serializer):
+        previous_owner_id = serializer.instance.owner_id
+        instance = serializer.save()
+        invalidate_groups([instance.uuid], extra_scopes=[owner_scope(previous_owner_id)])
+        publish_group_changes(saved=[instance])
+
+    def perform_destroy(self, instance):
+        delete_groups([instance])
+        if not settings.GROUP_PURGE_DEFERRED:
+            purge_groups([instance.uuid])
+
 class CreateTransaction(CreateAPIView):
     serializer_class = TransactionSerializer
 
+    @atomic
     def perform_create(self, serializer):
-        return serializer.save()
+        instance = serializer.save()
+        record_transaction_changes(added=[instance])
+        return instance
+
+class BatchView(APIView):
+    permission_classes = [IsAuthenticated]
+    apply_batch = None
+
+    def post(self, request):
+        input_serializer = BatchInputSerializer(data=request.data)
+        input_serializer.is_valid(raise_exception=True)
+
+        ok, results = self.apply_batch(owner=request.user, operations=input_serializer.validated_data['operations'])
+
+        return Response({'results': results}, status=status.HTTP_200_OK if ok else status.HTTP_400_BAD_REQUEST)
+
+class BatchTransactions(BatchView):
+    apply_batch = staticmethod(apply_transaction_batch)
+
+class GroupLookup(APIView):
+    # Answered from the owner/name unique index, so clients need not download every group to check a name
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        input_serializer = GroupLookupSerializer(data=request.query_params)
+        input_serializer.is_valid(raise_exception=True)
+
+        #pylint: disable=E1101
+        uuid = TransactionGroup.objects.filter(owner=request.user, name=input_serializer.validated_data['name']).values_list('uuid', flat=True).first()
+        return Response({'exists': uuid is not None, 'uuid': uuid})
 
 class CreateGroup(CreateAPIView):
     serializer_class = TransactionGroupSerializer
 
+    @atomic
     def perform_create(self, serializer):
-        return serializer.save()
+        instance = serializer.save()
+        invalidate_groups([instance.uuid])
+        publish_group_changes(saved=[instance])
+        return instance
+
+class BatchGroups(BatchView):
+    apply_batch = staticmethod(apply_group_batch)
+
+class Dashboard(CachedResponseMixin, RetrieveAPIView):
+    permission_classes = [IsAuthenticated]
+
+    def get_cache_scopes(self):
+        return [owner_scope(self.request.user.uuid)]
+
+    def retrieve(self, request, *args, **kwargs):
+        input_serializer = DashboardInputSerializer(data=request.query_params)
+        input_serializer.is_valid(raise_exception=True)
+        recent = input_serializer.validated_data['recent']
+
+        #pylint: disable=E1101
+        latest = Transaction.objects.order_by('-created','-uuid')
+        groups = list(
+            TransactionGroup.objects.filter(owner=request.user).order_by('created','uuid').prefetch_related(
+                Prefetch('transaction_set', queryset=latest.filter(amount__gt=0)[:recent], to_attr='recent_income'),
+                Prefetch('transaction_set', queryset=latest.filter(amount__lt=0)[:recent], to_attr='recent_expenses'),
+            )
+        )
+
+        # Group totals are maintained on write, so the user summary is their sum
+        user = request.user
+        for field in TOTAL_FIELDS:
+            setattr(user, field, sum(getattr(group, field) for group in groups))
+
+        return Response({
+            'user': GoogleUserSerializer(user).data,
+            'groups': DashboardGroupSerializer(groups, many=True).data,
+        })
+
+class ImportTransactions(APIView):
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        input_serializer = TransactionImportInputSerializer(data=request.data)
+        input_serializer.is_valid(raise_exception=True)
+
+        validated_data = input_serializer.validated_data
+        rows = READERS[validated_data['format']](validated_data['file'])
+        report = import_transactions(owner=request.user, rows=rows)
+
+        return Response(report)
+
+class ExportTransactions(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, file_format):
+        if file_format not in WRITERS:
+            raise Http404
+        writer, content_type = WRITERS[file_format]
+
+        content = writer(export_rows(request.user))
+        # DRF wraps the Django request, which is an ASGIRequest when an ASGI server is serving it
+        if isinstance(request._request, ASGIRequest): # pylint: disable=W0212
+            content = stream_async(content)
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="transactions.{file_format}"'
+        return response
+
+class ListRollups(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        filter_serializer = RollupFilterSerializer(data=request.query_params)
+        filter_serializer.is_valid(raise_exception=True)
+        filters = filter_serializer.validated_data
+
+        #pylint: disable=E1101
+        groups = TransactionGroup.objects.filter(owner=request.user)
+        if 'group' in filters:
+            groups = groups.filter(uuid=filters['group'])
+
+        series = rollup_series(groups=groups, period=filters['period'], since=filters.get('since'), until=filters.get('until'))
+        return Response(series)
+
+class CacheStats(APIView):
+    def get(self, request):
+        if not settings.RESPONSE_CACHE_STATS_ENABLED:
+            raise Http404
+        return Response(dict(cache_stats))
+
+class TransactionEvents(View):
+    # Server-Sent Events; under ASGI an idle stream is a parked coroutine rather than a busy worker
+    async def get(self, request):
+        # Under WSGI Django drains an async iterator before sending it, so a stream would hold a worker forever
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse({'detail': 'Event streams need the ASGI server (server.asgi).'}, status=501)
+
+        auth = get_authorization_header(request).split()
+        try:
+            jwt_token = auth[1].decode() if len(auth) == 2 and auth[0].lower() == b'bearer' else request.COOKIES.get('Token')
+        except UnicodeError:
+            return JsonResponse({'detail': 'Invalid token header'}, status=401)
+        if not jwt_token:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+        try:
+            jwt_data = verify_jwt_token(jwt_token)
+            # pylint: disable=E1101
+            user = await GoogleUser.objects.aget(email=jwt_data.get('email'))
+        except (jwt.InvalidTokenError, GoogleUser.DoesNotExist):
+            return JsonResponse({'detail': 'Invalid token'}, status=401)
+
+        response = StreamingHttpResponse(event_stream(user.uuid), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response